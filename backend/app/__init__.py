@@ -1,6 +1,17 @@
-from flask import Flask
+import time
+from flask import Flask, g, request
 from flask_cors import CORS
 from .config import Config
+from .utils import metrics, profiling
+from .utils.process import count_commands
+
+REQUEST_DURATION = metrics.histogram(
+    'armas_request_duration_seconds', 'API request latency.', ['endpoint']
+)
+REQUEST_COMMANDS = metrics.histogram(
+    'armas_request_commands', 'External commands run while serving one request.',
+    ['endpoint'], buckets=(0, 1, 2, 5, 10, 25, 50)
+)
 
 
 def create_app():
@@ -11,14 +22,56 @@ def create_app():
     CORS(app, origins=Config.CORS_ORIGINS.split(','))
 
     # Register blueprints
-    from .routes import devices, control, timers
+    from .routes import devices, control, timers, schedules, groups, events, metrics, dashboard, usage
     app.register_blueprint(devices.bp)
     app.register_blueprint(control.bp)
     app.register_blueprint(timers.bp)
+    app.register_blueprint(schedules.bp)
+    app.register_blueprint(groups.bp)
+    app.register_blueprint(events.bp)
+    app.register_blueprint(metrics.bp)
+    app.register_blueprint(dashboard.bp)
+    app.register_blueprint(usage.bp)
+
+    # Serve the state saved by the last run straight away; the live
+    # firewall and network are checked in the background
+    from . import services
+    services.start()
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.command_count = count_commands()
+
+    @app.after_request
+    def record_request_metrics(response):
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_DURATION.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+        REQUEST_COMMANDS.observe(g.command_count[0], endpoint=endpoint)
+        return response
+
+    # Opt-in span tracing, slow-request log and ?profile=1
+    if Config.PROFILING:
+        profiling.install(
+            app,
+            slow_ms=Config.SLOW_REQUEST_MS,
+            log_path=Config.SLOW_REQUEST_LOG or None,
+            profile_allowed=lambda req: req.headers.get('X-API-Key') == Config.API_KEY
+        )
 
     # Health check endpoint
     @app.route('/api/health')
     def health():
-        return {'success': True, 'data': {'status': 'ok'}}
+        return {
+            'success': True,
+            'data': {
+                'status': 'ok',
+                'stale': services.stale(),
+                'startup': {
+                    phase: round(seconds, 4)
+                    for phase, seconds in list(services.startup_timings.items())
+                }
+            }
+        }
 
     return app
@@ -8,7 +8,47 @@ class Config:
     API_KEY = os.getenv('API_KEY', 'change-this-to-a-secure-random-key')
     NETWORK_RANGE = os.getenv('NETWORK_RANGE', '192.168.100.0/24')
     NETWORK_INTERFACE = os.getenv('NETWORK_INTERFACE', 'eth0')
+    SCAN_INTERVAL = int(os.getenv('SCAN_INTERVAL', 60))
+    SCAN_TARGETS = os.getenv('SCAN_TARGETS', '')
+    SCAN_SHARD_PREFIX = int(os.getenv('SCAN_SHARD_PREFIX', 24))
+    SCAN_WORKERS = int(os.getenv('SCAN_WORKERS', 4))
+    SCAN_SHARD_TIMEOUT = int(os.getenv('SCAN_SHARD_TIMEOUT', 30))
+    DISCOVERY_MODE = os.getenv('DISCOVERY_MODE', 'hybrid')
+    ACTIVE_SCAN_INTERVAL = int(os.getenv('ACTIVE_SCAN_INTERVAL', 900))
+    DEVICE_TTL = int(os.getenv('DEVICE_TTL', 600))
+    DEVICE_CHANGE_LOG_SIZE = int(os.getenv('DEVICE_CHANGE_LOG_SIZE', 2000))
+    DEVICE_HISTORY_SESSIONS = int(os.getenv('DEVICE_HISTORY_SESSIONS', 16))
+    DEVICE_HISTORY_LIMIT = int(os.getenv('DEVICE_HISTORY_LIMIT', 4096))
+    ARP_TABLE_PATH = os.getenv('ARP_TABLE_PATH', '/proc/net/arp')
+    DHCP_LEASES_FILE = os.getenv('DHCP_LEASES_FILE', '')
+    PRESENCE_MODE = os.getenv('PRESENCE_MODE', 'auto')
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 5000))
     DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
+    SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+    ASGI_WORKERS = int(os.getenv('ASGI_WORKERS', 16))
+    SUBPROCESS_CONCURRENCY = int(os.getenv('SUBPROCESS_CONCURRENCY', 4))
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*')
+    DATA_DIR = os.getenv(
+        'DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'data')
+    )
+    DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(DATA_DIR, 'armas.db'))
+    OUI_DB_PATH = os.getenv('OUI_DB_PATH', os.path.join(DATA_DIR, 'oui.bin'))
+    FIREWALL_BACKEND = os.getenv('FIREWALL_BACKEND', 'iptables')
+    FIREWALL_CHAIN = os.getenv('FIREWALL_CHAIN', 'ARMAS_BLOCK')
+    FIREWALL_SET = os.getenv('FIREWALL_SET', 'armas_block')
+    SHAPING_INTERFACES = os.getenv('SHAPING_INTERFACES', NETWORK_INTERFACE)
+    SHAPING_CHAIN = os.getenv('SHAPING_CHAIN', 'ARMAS_SHAPE')
+    ACCOUNTING_CHAIN = os.getenv('ACCOUNTING_CHAIN', 'ARMAS_ACCT')
+    ACCOUNTING_INTERVAL = int(os.getenv('ACCOUNTING_INTERVAL', 60))
+    ACCOUNTING_SAMPLES = int(os.getenv('ACCOUNTING_SAMPLES', 1440))
+    ACCOUNTING_MAX_DEVICES = int(os.getenv('ACCOUNTING_MAX_DEVICES', 256))
+    SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', os.path.join(DATA_DIR, 'snapshot.json'))
+    SNAPSHOT_INTERVAL = int(os.getenv('SNAPSHOT_INTERVAL', 60))
+    RECONCILE_INTERVAL = int(os.getenv('RECONCILE_INTERVAL', 300))
+    FIREWALL_COALESCE_MS = int(os.getenv('FIREWALL_COALESCE_MS', 50))
+    QUOTA_CHECK_INTERVAL = int(os.getenv('QUOTA_CHECK_INTERVAL', 60))
+    EVENT_BUFFER_SIZE = int(os.getenv('EVENT_BUFFER_SIZE', 500))
+    PROFILING = os.getenv('PROFILING', 'false').lower() == 'true'
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+    SLOW_REQUEST_LOG = os.getenv('SLOW_REQUEST_LOG', '')
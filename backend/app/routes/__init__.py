@@ -1 +1 @@
-from . import devices, control, timers
+from . import devices, control, timers, schedules, groups, events, metrics, dashboard, usage
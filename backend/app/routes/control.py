@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from ..utils.auth import require_api_key
-from ..services import wifi_controller, timer_manager
+from ..services import wifi_controller, timer_manager, traffic_shaper
 
 bp = Blueprint('control', __name__, url_prefix='/api/control')
 
@@ -99,6 +99,180 @@ def unblock_device():
         }), 500
 
 
+@bp.route('/throttle', methods=['POST'])
+@require_api_key
+def throttle_device():
+    """Cap a device's bandwidth instead of blocking it."""
+    try:
+        data = request.get_json()
+        mac = data.get('mac')
+        rate_kbit = data.get('rate_kbit')
+
+        if not mac:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'MISSING_MAC',
+                    'message': 'MAC address is required'
+                }
+            }), 400
+
+        if isinstance(rate_kbit, bool) or not isinstance(rate_kbit, (int, float)) or rate_kbit < 1:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_RATE',
+                    'message': 'rate_kbit must be a positive number'
+                }
+            }), 400
+
+        result = traffic_shaper.throttle(mac, rate_kbit)
+
+        return jsonify({
+            'success': True,
+            'data': dict(result, throttled=True)
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_MAC',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'THROTTLE_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/unthrottle', methods=['POST'])
+@require_api_key
+def unthrottle_device():
+    """Lift a device's bandwidth cap."""
+    try:
+        data = request.get_json()
+        mac = data.get('mac')
+
+        if not mac:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'MISSING_MAC',
+                    'message': 'MAC address is required'
+                }
+            }), 400
+
+        changed = traffic_shaper.unthrottle(mac)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'mac': mac.upper(),
+                'throttled': False,
+                'changed': changed
+            }
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_MAC',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'UNTHROTTLE_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/throttled', methods=['GET'])
+@require_api_key
+def list_throttled():
+    """List throttled devices and their caps in kbit/s."""
+    try:
+        throttled = [
+            {'mac': mac, 'rate_kbit': rate}
+            for mac, rate in traffic_shaper.get_throttled().items()
+        ]
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'throttled': throttled,
+                'count': len(throttled),
+                'stale': traffic_shaper.stale
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/block-batch', methods=['POST'])
+@require_api_key
+def block_batch():
+    """Block or unblock several devices in one firewall transaction."""
+    try:
+        data = request.get_json()
+        macs = data.get('macs')
+        action = data.get('action', 'block')
+
+        if not macs or not isinstance(macs, list):
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'MISSING_MACS',
+                    'message': 'A list of MAC addresses is required'
+                }
+            }), 400
+
+        if action not in ('block', 'unblock'):
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_ACTION',
+                    'message': "Action must be 'block' or 'unblock'"
+                }
+            }), 400
+
+        # Cancel any active timers for these devices
+        timer_manager.cancel_timers([mac for mac in macs if isinstance(mac, str)])
+
+        results = wifi_controller.apply_batch(macs, action)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'action': action,
+                'results': results,
+                'count': len(results)
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'BATCH_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+
 @bp.route('/status/<mac>', methods=['GET'])
 @require_api_key
 def get_status(mac):
@@ -110,7 +284,8 @@ def get_status(mac):
             'success': True,
             'data': {
                 'mac': mac.upper(),
-                'blocked': blocked
+                'blocked': blocked,
+                'throttle_kbit': traffic_shaper.get_rate(mac)
             }
         })
     except ValueError as e:
@@ -138,6 +313,40 @@ def list_blocked():
     try:
         blocked = wifi_controller.get_blocked_macs()
 
+        return jsonify({
+            'success': True,
+            'data': {
+                'blocked': blocked,
+                'count': len(blocked),
+                'stale': wifi_controller.stale
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/reconcile', methods=['POST'])
+@require_api_key
+def reconcile():
+    """Resync the blocked list with the live firewall rules."""
+    try:
+        if not wifi_controller.reconcile():
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'RECONCILE_FAILED',
+                    'message': 'Could not read firewall rules'
+                }
+            }), 500
+
+        blocked = wifi_controller.get_blocked_macs()
+
         return jsonify({
             'success': True,
             'data': {
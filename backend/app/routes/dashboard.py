@@ -0,0 +1,36 @@
+from flask import Blueprint, Response, request, jsonify
+from ..utils.auth import require_api_key
+from ..services import dashboard
+
+bp = Blueprint('dashboard', __name__, url_prefix='/api')
+
+
+@bp.route('/dashboard', methods=['GET'])
+@require_api_key
+def get_dashboard():
+    """Devices with their blocked state, timers and groups in one response.
+
+    Send the ETag back in If-None-Match; if nothing changed since, the
+    answer is an empty 304.
+    """
+    try:
+        # Read the tag first; a change during the build only makes the next poll refetch
+        tag = dashboard.etag()
+        if request.if_none_match.contains_weak(tag):
+            response = Response(status=304)
+        else:
+            response = jsonify({
+                'success': True,
+                'data': dashboard.build()
+            })
+        response.set_etag(tag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from ..utils.auth import require_api_key
-from ..services import device_scanner, wifi_controller
+from ..services import device_scanner, wifi_controller, timer_manager
 
 bp = Blueprint('devices', __name__, url_prefix='/api')
 
@@ -8,21 +8,50 @@ bp = Blueprint('devices', __name__, url_prefix='/api')
 @bp.route('/devices', methods=['GET'])
 @require_api_key
 def list_devices():
-    """List all devices on the network."""
+    """List all devices on the network from the latest scan.
+
+    Pass ?since=<cursor> (from a previous response) to get only what
+    changed since then. If the cursor is too old the full list comes back
+    with reset set.
+    """
     try:
-        devices = device_scanner.scan_network()
-        blocked_macs = wifi_controller.get_blocked_macs()
+        since = request.args.get('since', type=int)
+        blocked_macs = set(wifi_controller.get_blocked_macs())
+
+        if since is not None:
+            changes, cursor = device_scanner.get_changes(since)
+            if changes is not None:
+                for change in changes:
+                    if 'device' in change:
+                        change['device']['blocked'] = change['mac'] in blocked_macs
+                return jsonify({
+                    'success': True,
+                    'data': {
+                        'changes': changes,
+                        'cursor': cursor,
+                        'reset': False
+                    }
+                })
+
+        # Read the cursor first; a client may then see a change twice, never miss one
+        cursor = device_scanner.changes.cursor
+        devices, age = device_scanner.get_devices()
 
         # Add blocked status to each device
         for device in devices:
             device['blocked'] = device['mac'] in blocked_macs
-            device['online'] = True
 
         return jsonify({
             'success': True,
             'data': {
                 'devices': devices,
-                'count': len(devices)
+                'count': len(devices),
+                'cache_age': round(age, 1) if age is not None else None,
+                'last_scan': device_scanner.last_scan,
+                # Saved state from before a restart, not yet checked live
+                'stale': device_scanner.stale or wifi_controller.stale,
+                'cursor': cursor,
+                'reset': since is not None
             }
         })
     except Exception as e:
@@ -38,9 +67,13 @@ def list_devices():
 @bp.route('/devices/<mac>', methods=['GET'])
 @require_api_key
 def get_device(mac):
-    """Get info for a specific device."""
+    """Get info for a specific device.
+
+    Pass ?refresh=1 to re-check just this device on the network first.
+    """
     try:
-        device = device_scanner.get_device(mac)
+        probe = request.args.get('refresh') in ('1', 'true')
+        device = device_scanner.get_device(mac, probe=probe)
 
         if not device:
             return jsonify({
@@ -52,6 +85,7 @@ def get_device(mac):
             }), 404
 
         device['blocked'] = wifi_controller.is_blocked(mac)
+        device['groups'] = timer_manager.groups.groups_for(mac)
 
         return jsonify({
             'success': True,
@@ -75,6 +109,39 @@ def get_device(mac):
         }), 500
 
 
+@bp.route('/devices/<mac>/history', methods=['GET'])
+@require_api_key
+def get_device_history(mac):
+    """Get when a device was first and last seen, one entry per session."""
+    try:
+        sessions = device_scanner.get_history(mac)
+
+        if sessions is None:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'DEVICE_NOT_FOUND',
+                    'message': f'No history for device with MAC {mac}'
+                }
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'mac': mac.upper(),
+                'sessions': sessions
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
 @bp.route('/devices/<mac>/name', methods=['PUT'])
 @require_api_key
 def set_device_name(mac):
@@ -116,18 +183,19 @@ def set_device_name(mac):
 def force_scan():
     """Force a network rescan."""
     try:
-        devices = device_scanner.scan_network()
-        blocked_macs = wifi_controller.get_blocked_macs()
+        devices = device_scanner.refresh(full=True)
+        blocked_macs = set(wifi_controller.get_blocked_macs())
 
         for device in devices:
             device['blocked'] = device['mac'] in blocked_macs
-            device['online'] = True
 
         return jsonify({
             'success': True,
             'data': {
                 'devices': devices,
-                'count': len(devices)
+                'count': len(devices),
+                'cache_age': 0,
+                'last_scan': device_scanner.last_scan
             }
         })
     except Exception as e:
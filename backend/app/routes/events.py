@@ -0,0 +1,72 @@
+import json
+from flask import Blueprint, Response, request
+from ..utils.auth import require_api_key
+from ..services import event_bus, device_scanner, wifi_controller, timer_manager
+
+bp = Blueprint('events', __name__, url_prefix='/api')
+
+KEEPALIVE_SECONDS = 15
+
+
+def _format(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def _snapshot():
+    """Current state, sent first so deltas have something to apply to."""
+    devices, age = device_scanner.get_cached()
+    blocked = wifi_controller.get_blocked_macs()
+    blocked_set = set(blocked)
+    for device in devices:
+        device['blocked'] = device['mac'] in blocked_set
+
+    return {
+        'devices': devices,
+        'blocked': blocked,
+        'timers': timer_manager.get_all_timers(),
+        'cache_age': round(age, 1) if age is not None else None
+    }
+
+
+@bp.route('/events', methods=['GET'])
+@require_api_key
+def stream_events():
+    """Stream device, block and timer changes as server-sent events.
+
+    New clients get a snapshot followed by deltas. Clients reconnecting
+    with Last-Event-ID get only what they missed, or a fresh snapshot if
+    it has already left the replay buffer.
+    """
+    resume = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        resume = int(resume) if resume is not None else None
+    except ValueError:
+        resume = None
+
+    def generate():
+        last_id = resume
+        backlog = event_bus.since(last_id) if last_id is not None else None
+        if backlog is None:
+            last_id = event_bus.last_id
+            yield _format(last_id, 'snapshot', _snapshot())
+            backlog = event_bus.since(last_id) or []
+
+        while True:
+            for event in backlog:
+                last_id = event['id']
+                yield _format(event['id'], event['type'], event['data'])
+
+            backlog = event_bus.wait(last_id, KEEPALIVE_SECONDS)
+            if backlog is None:
+                # Fell behind the replay buffer; start over from a snapshot
+                last_id = event_bus.last_id
+                yield _format(last_id, 'snapshot', _snapshot())
+                backlog = event_bus.since(last_id) or []
+            elif not backlog:
+                yield ': keep-alive\n\n'
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,320 @@
+from flask import Blueprint, request, jsonify
+from ..utils.auth import require_api_key
+from ..services import timer_manager
+
+bp = Blueprint('groups', __name__, url_prefix='/api/groups')
+
+
+def group_not_found(group_id):
+    return jsonify({
+        'success': False,
+        'error': {
+            'code': 'GROUP_NOT_FOUND',
+            'message': f'Group {group_id} not found'
+        }
+    }), 404
+
+
+@bp.route('', methods=['GET'])
+@require_api_key
+def list_groups():
+    """List all device groups."""
+    try:
+        groups = timer_manager.groups.get_groups()
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'groups': groups,
+                'count': len(groups)
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('', methods=['POST'])
+@require_api_key
+def create_group():
+    """Create a group, optionally with a list of member MACs."""
+    try:
+        data = request.get_json()
+
+        group = timer_manager.groups.create_group(data.get('name'), data.get('macs'))
+
+        return jsonify({
+            'success': True,
+            'data': {'group': group}
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_GROUP',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/<int:group_id>', methods=['GET'])
+@require_api_key
+def get_group(group_id):
+    """Get a group and its members."""
+    try:
+        group = timer_manager.groups.get_group(group_id)
+
+        if not group:
+            return group_not_found(group_id)
+
+        return jsonify({
+            'success': True,
+            'data': {'group': group}
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/<int:group_id>', methods=['PUT'])
+@require_api_key
+def update_group(group_id):
+    """Rename a group and/or replace its members."""
+    try:
+        data = request.get_json()
+
+        group = timer_manager.groups.update_group(
+            group_id, name=data.get('name'), macs=data.get('macs')
+        )
+
+        if not group:
+            return group_not_found(group_id)
+
+        return jsonify({
+            'success': True,
+            'data': {'group': group}
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_GROUP',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/<int:group_id>', methods=['DELETE'])
+@require_api_key
+def delete_group(group_id):
+    """Delete a group. Its members keep their current block state."""
+    try:
+        result = timer_manager.groups.delete_group(group_id)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'id': group_id,
+                'deleted': result
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/<int:group_id>/members', methods=['POST'])
+@require_api_key
+def add_members(group_id):
+    """Add devices to a group."""
+    try:
+        data = request.get_json()
+
+        group = timer_manager.groups.add_members(group_id, data.get('macs'))
+
+        if not group:
+            return group_not_found(group_id)
+
+        return jsonify({
+            'success': True,
+            'data': {'group': group}
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_MAC',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/<int:group_id>/members/<mac>', methods=['DELETE'])
+@require_api_key
+def remove_member(group_id, mac):
+    """Remove a device from a group."""
+    try:
+        group = timer_manager.groups.remove_members(group_id, [mac])
+
+        if not group:
+            return group_not_found(group_id)
+
+        return jsonify({
+            'success': True,
+            'data': {'group': group}
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_MAC',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+def apply_action(group_id, action):
+    try:
+        results = timer_manager.groups.apply(group_id, action)
+
+        if results is None:
+            return group_not_found(group_id)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'id': group_id,
+                'action': action,
+                'results': results,
+                'count': len(results)
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'BLOCK_FAILED' if action == 'block' else 'UNBLOCK_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/<int:group_id>/block', methods=['POST'])
+@require_api_key
+def block_group(group_id):
+    """Block every device in a group in one firewall transaction."""
+    return apply_action(group_id, 'block')
+
+
+@bp.route('/<int:group_id>/unblock', methods=['POST'])
+@require_api_key
+def unblock_group(group_id):
+    """Unblock every device in a group in one firewall transaction."""
+    return apply_action(group_id, 'unblock')
+
+
+@bp.route('/<int:group_id>/timer', methods=['POST'])
+@require_api_key
+def set_group_timer(group_id):
+    """Block the whole group after a number of minutes."""
+    try:
+        data = request.get_json()
+        minutes = data.get('minutes')
+
+        if not minutes or not isinstance(minutes, (int, float)) or minutes <= 0:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_MINUTES',
+                    'message': 'Minutes must be a positive number'
+                }
+            }), 400
+
+        timer = timer_manager.groups.set_timer(group_id, int(minutes))
+
+        if not timer:
+            return group_not_found(group_id)
+
+        return jsonify({
+            'success': True,
+            'data': {'id': group_id, 'timer': timer}
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'TIMER_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/<int:group_id>/timer', methods=['DELETE'])
+@require_api_key
+def cancel_group_timer(group_id):
+    """Cancel a group's timer."""
+    try:
+        result = timer_manager.groups.cancel_timer(group_id)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'id': group_id,
+                'cancelled': result
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from ..utils import metrics
+from ..utils.auth import require_api_key
+
+bp = Blueprint('metrics', __name__, url_prefix='/api')
+
+
+@bp.route('/metrics', methods=['GET'])
+@require_api_key
+def get_metrics():
+    """Expose counters, histograms and gauges in Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,188 @@
+from flask import Blueprint, request, jsonify
+from ..utils.auth import require_api_key
+from ..services import timer_manager
+
+bp = Blueprint('schedules', __name__, url_prefix='/api/schedules')
+
+
+@bp.route('', methods=['GET'])
+@require_api_key
+def list_schedules():
+    """List all recurring block schedules."""
+    try:
+        schedules = timer_manager.schedules.get_schedules()
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'schedules': schedules,
+                'count': len(schedules)
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('', methods=['POST'])
+@require_api_key
+def add_schedule():
+    """Add a recurring block window for one or more devices or groups."""
+    try:
+        data = request.get_json()
+
+        schedule = timer_manager.schedules.add_schedule(
+            data.get('macs'),
+            data.get('days'),
+            data.get('start'),
+            data.get('end'),
+            name=data.get('name'),
+            groups=data.get('groups')
+        )
+
+        return jsonify({
+            'success': True,
+            'data': {'schedule': schedule}
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_SCHEDULE',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'SCHEDULE_FAILED',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/<int:schedule_id>', methods=['DELETE'])
+@require_api_key
+def remove_schedule(schedule_id):
+    """Delete a schedule."""
+    try:
+        result = timer_manager.schedules.remove_schedule(schedule_id)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'id': schedule_id,
+                'deleted': result
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/quotas', methods=['GET'])
+@require_api_key
+def list_quotas():
+    """List daily usage quotas and today's usage."""
+    try:
+        quotas = timer_manager.schedules.get_quotas()
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'quotas': quotas,
+                'count': len(quotas)
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/quotas/<mac>', methods=['PUT'])
+@require_api_key
+def set_quota(mac):
+    """Set a device's daily online-time quota."""
+    try:
+        data = request.get_json()
+        minutes = data.get('minutes')
+
+        if not isinstance(minutes, int) or minutes <= 0:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_MINUTES',
+                    'message': 'Minutes must be a positive integer'
+                }
+            }), 400
+
+        quota = timer_manager.schedules.set_quota(mac, minutes)
+
+        return jsonify({
+            'success': True,
+            'data': {'quota': quota}
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_MAC',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/quotas/<mac>', methods=['DELETE'])
+@require_api_key
+def remove_quota(mac):
+    """Remove a device's daily quota."""
+    try:
+        result = timer_manager.schedules.remove_quota(mac)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'mac': mac.upper(),
+                'deleted': result
+            }
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_MAC',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
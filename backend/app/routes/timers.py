@@ -8,11 +8,17 @@ bp = Blueprint('timers', __name__, url_prefix='/api/timers')
 @bp.route('', methods=['POST'])
 @require_api_key
 def set_timer():
-    """Set a time limit for a device."""
+    """Set a time limit for a device.
+
+    The device is blocked when it runs out, or with "action": "throttle"
+    capped at "rate_kbit" instead.
+    """
     try:
         data = request.get_json()
         mac = data.get('mac')
         minutes = data.get('minutes')
+        action = data.get('action', 'block')
+        rate_kbit = data.get('rate_kbit')
 
         if not mac:
             return jsonify({
@@ -32,7 +38,26 @@ def set_timer():
                 }
             }), 400
 
-        timer = timer_manager.set_timer(mac, int(minutes))
+        if action not in timer_manager.ACTIONS:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_ACTION',
+                    'message': "Action must be 'block' or 'throttle'"
+                }
+            }), 400
+
+        if action == 'throttle' and (
+                isinstance(rate_kbit, bool) or not isinstance(rate_kbit, (int, float)) or rate_kbit < 1):
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'INVALID_RATE',
+                    'message': 'rate_kbit must be a positive number for throttle timers'
+                }
+            }), 400
+
+        timer = timer_manager.set_timer(mac, int(minutes), action, rate_kbit)
 
         return jsonify({
             'success': True,
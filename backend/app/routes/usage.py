@@ -0,0 +1,96 @@
+from flask import Blueprint, request, jsonify
+from ..utils.auth import require_api_key
+from ..services import traffic_accounting
+
+bp = Blueprint('usage', __name__, url_prefix='/api')
+
+
+def _window():
+    """The ?window=<seconds> to report on; everything recorded if absent."""
+    window = request.args.get('window', type=int)
+    if window is not None and window <= 0:
+        raise ValueError('window must be a positive number of seconds')
+    return window
+
+
+@bp.route('/devices/<mac>/usage', methods=['GET'])
+@require_api_key
+def get_device_usage(mac):
+    """Get a device's traffic, one sample per accounting interval.
+
+    Pass ?window=<seconds> to only cover the most recent part.
+    """
+    try:
+        usage = traffic_accounting.get_usage(mac, _window())
+
+        if usage is None:
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': 'DEVICE_NOT_FOUND',
+                    'message': f'No traffic recorded for device with MAC {mac}'
+                }
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'data': usage
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_WINDOW',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
+
+
+@bp.route('/usage/top', methods=['GET'])
+@require_api_key
+def get_top_talkers():
+    """List the devices that used the most bandwidth.
+
+    Pass ?window=<seconds> to rank by recent traffic only and ?limit=<n>
+    for a longer or shorter list (10 by default).
+    """
+    try:
+        window = _window()
+        limit = request.args.get('limit', 10, type=int)
+        if limit <= 0:
+            raise ValueError('limit must be a positive number')
+
+        devices = traffic_accounting.get_top(window, limit)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'devices': devices,
+                'count': len(devices),
+                'window': window
+            }
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_REQUEST',
+                'message': str(e)
+            }
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ERROR',
+                'message': str(e)
+            }
+        }), 500
@@ -1,8 +1,181 @@
+import atexit
+import threading
+import time
 from .wifi_control import WifiController
 from .device_scanner import DeviceScanner
 from .timer_manager import TimerManager
+from .traffic_shaper import TrafficShaper
+from .traffic_accounting import TrafficAccounting
+from .events import EventBus
+from .dashboard import Dashboard
+from .snapshot import StateSnapshot
+from ..config import Config
+from ..utils import metrics
 
-# Shared service instances
-wifi_controller = WifiController()
-device_scanner = DeviceScanner()
-timer_manager = TimerManager(wifi_controller)
+_constructing = time.perf_counter()
+
+# Shared service instances; constructing them touches neither the firewall
+# nor the network, that is left to start()
+event_bus = EventBus(Config.EVENT_BUFFER_SIZE)
+wifi_controller = WifiController(events=event_bus)
+device_scanner = DeviceScanner(events=event_bus)
+traffic_shaper = TrafficShaper(events=event_bus)
+timer_manager = TimerManager(
+    wifi_controller, presence=device_scanner.presence, events=event_bus,
+    shaper=traffic_shaper
+)
+traffic_accounting = TrafficAccounting(devices=lambda: device_scanner.get_cached()[0])
+dashboard = Dashboard(device_scanner, wifi_controller, timer_manager, traffic_shaper)
+
+snapshot = StateSnapshot(Config.SNAPSHOT_PATH) if Config.SNAPSHOT_PATH else None
+
+# Seconds spent in each startup phase, for the log, /api/health and metrics
+startup_timings = {'services': time.perf_counter() - _constructing}
+# Set once the background reconcile after start() has finished
+reconciled = threading.Event()
+_start_lock = threading.Lock()
+_started = False
+
+
+def start():
+    """Bring the services up; called once from create_app.
+
+    Only local reads happen before this returns: the snapshot of devices,
+    blocks and throttles (one file) and the persisted timers (one query).
+    They are served at once, flagged as stale, while the firewall, traffic
+    shaping and the network are checked in the background.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+    began = time.perf_counter()
+    _timed('snapshot', restore_snapshot)
+    _timed('timers', timer_manager.start)
+    # Keep the device list warm so requests never wait on arp-scan
+    device_scanner.start()
+    startup_timings['ready'] = time.perf_counter() - began
+
+    threading.Thread(
+        target=_reconcile, args=(began,), name='startup-reconcile', daemon=True
+    ).start()
+    if snapshot:
+        atexit.register(save_snapshot)
+
+
+def _timed(phase, func):
+    started = time.perf_counter()
+    try:
+        return func()
+    except Exception as e:
+        print(f"Startup phase {phase} failed: {e}")
+    finally:
+        startup_timings[phase] = time.perf_counter() - started
+
+
+def _reconcile(began):
+    """Sync with the live system, then catch up timers and start the jobs."""
+    _timed('firewall', wifi_controller.start)
+    _timed('shaping', traffic_shaper.start)
+    _timed('accounting', traffic_accounting.setup)
+    _timed('catch_up', timer_manager.catch_up)
+    _add_jobs()
+    startup_timings['reconciled'] = time.perf_counter() - began
+    reconciled.set()
+
+    device_scanner.wait_live()
+    startup_timings['first_scan'] = time.perf_counter() - began
+    print('Startup: ' + ', '.join(
+        f'{phase} {seconds * 1000:.1f}ms' for phase, seconds in startup_timings.items()
+    ))
+
+
+def _add_jobs():
+    """Schedule the periodic jobs, once the system has been synced."""
+    # Periodically pick up firewall rules changed outside the API
+    timer_manager.scheduler.add_job(
+        func=wifi_controller.reconcile,
+        trigger='interval',
+        seconds=Config.RECONCILE_INTERVAL,
+        id='reconcile_firewall',
+        replace_existing=True
+    )
+    timer_manager.scheduler.add_job(
+        func=traffic_shaper.reconcile,
+        trigger='interval',
+        seconds=Config.RECONCILE_INTERVAL,
+        id='reconcile_shaping',
+        replace_existing=True
+    )
+
+    # Sample per-device traffic counters
+    timer_manager.scheduler.add_job(
+        func=traffic_accounting.sample,
+        trigger='interval',
+        seconds=Config.ACCOUNTING_INTERVAL,
+        id='account_traffic',
+        replace_existing=True
+    )
+    if snapshot:
+        timer_manager.scheduler.add_job(
+            func=save_snapshot,
+            trigger='interval',
+            seconds=Config.SNAPSHOT_INTERVAL,
+            id='save_snapshot',
+            replace_existing=True
+        )
+
+
+def restore_snapshot():
+    """Load the last saved state into the services, if there is one."""
+    state = snapshot.load() if snapshot else None
+    if state is None:
+        return False
+    if state['scanned_at'] is not None:
+        device_scanner.restore(state['devices'], state['scanned_at'])
+    wifi_controller.restore(state['blocked'])
+    traffic_shaper.restore({mac: tuple(shaped) for mac, shaped in state['throttled'].items()})
+    return True
+
+
+def save_snapshot():
+    """Write the current devices, blocks and throttles for the next start."""
+    try:
+        devices, scanned_at = device_scanner.export()
+        snapshot.save(
+            devices, scanned_at, wifi_controller.get_blocked_macs(), traffic_shaper.export()
+        )
+    except Exception as e:
+        print(f"Could not save snapshot: {e}")
+
+
+def stale():
+    """True while any served state has not been checked against the live system yet."""
+    return device_scanner.stale or wifi_controller.stale or traffic_shaper.stale
+
+
+# State exposed at /api/metrics, read when scraped
+metrics.gauge(
+    'armas_blocked_devices', 'Devices currently blocked.',
+    lambda: len(wifi_controller.get_blocked_macs())
+)
+metrics.gauge(
+    'armas_throttled_devices', 'Devices currently throttled.',
+    lambda: len(traffic_shaper.get_throttled())
+)
+metrics.gauge(
+    'armas_active_timers', 'Pending block timers.',
+    lambda: {(kind,): count for kind, count in timer_manager.count_timers().items()},
+    labels=['kind']
+)
+metrics.gauge(
+    'armas_device_cache_age_seconds', 'Age of the cached device list.',
+    device_scanner.cache_age
+)
+metrics.gauge(
+    'armas_startup_seconds', 'Time spent in each startup phase.',
+    lambda: {(phase,): seconds for phase, seconds in list(startup_timings.items())},
+    labels=['phase']
+)
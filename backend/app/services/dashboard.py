@@ -0,0 +1,89 @@
+import time
+
+
+class Dashboard:
+    """Everything the app's main screen shows, in one response.
+
+    Devices, blocked state, timers and groups are joined on MAC through
+    dicts built once per request, instead of the client fetching three
+    lists and matching them up. Each service keeps a version number that
+    moves when its state changes, and together they make the ETag, so an
+    unchanged poll can be answered without building anything.
+    """
+
+    def __init__(self, device_scanner, wifi_controller, timer_manager, traffic_shaper=None):
+        self.device_scanner = device_scanner
+        self.wifi_controller = wifi_controller
+        self.timer_manager = timer_manager
+        self.traffic_shaper = traffic_shaper
+        # Versions restart with the process; keep old ETags from matching
+        self._boot = '%x' % int(time.time())
+
+    def etag(self):
+        """Tag for the current state, to be sent as a weak ETag.
+
+        Weak because remaining_seconds keeps counting down between
+        changes; clients work it out from expires_at and generated_at.
+        """
+        versions = (
+            self.device_scanner.changes.cursor,
+            self.device_scanner.presence.version,
+            self.wifi_controller.version,
+            self.timer_manager.version,
+            self.timer_manager.groups.version,
+            self.traffic_shaper.version if self.traffic_shaper else 0,
+            int(self._stale())
+        )
+        return '%s-%s' % (self._boot, '.'.join(str(v) for v in versions))
+
+    def _stale(self):
+        shaper_stale = self.traffic_shaper.stale if self.traffic_shaper else False
+        return self.device_scanner.stale or self.wifi_controller.stale or shaper_stale
+
+    def build(self):
+        devices, age = self.device_scanner.get_devices()
+        blocked = set(self.wifi_controller.get_blocked_macs())
+        timers = {timer['mac']: timer for timer in self.timer_manager.get_all_timers()}
+        throttled = self.traffic_shaper.get_throttled() if self.traffic_shaper else {}
+        groups = self.timer_manager.groups
+        memberships = groups.memberships()
+
+        # Blocked, throttled or timed devices that the last scan did not
+        # see still belong on the dashboard
+        seen = {device['mac'] for device in devices}
+        for mac in sorted((blocked | timers.keys() | throttled.keys()) - seen):
+            devices.append({
+                'mac': mac,
+                'ip': None,
+                'name': None,
+                'vendor': None,
+                'online': self.device_scanner.presence.is_online(mac, default=False)
+            })
+
+        for device in devices:
+            mac = device['mac']
+            timer = timers.get(mac)
+            device['blocked'] = mac in blocked
+            device['throttle_kbit'] = throttled.get(mac)
+            device['timer'] = {
+                'expires_at': timer['expires_at'],
+                'remaining_seconds': timer['remaining_seconds'],
+                'action': timer['action']
+            } if timer else None
+            device['groups'] = memberships.get(mac, [])
+
+        return {
+            'devices': devices,
+            'groups': groups.get_groups(),
+            'counts': {
+                'devices': len(seen),
+                'online': sum(1 for device in devices if device['online']),
+                'blocked': len(blocked),
+                'throttled': len(throttled),
+                'timers': len(timers)
+            },
+            'cache_age': round(age, 1) if age is not None else None,
+            'last_scan': self.device_scanner.last_scan,
+            'stale': self._stale(),
+            'generated_at': time.time()
+        }
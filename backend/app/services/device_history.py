@@ -0,0 +1,93 @@
+from array import array
+from collections import OrderedDict, deque
+
+
+class SessionRing:
+    """The last few (first_seen, last_seen) sessions of one device.
+
+    Timestamps live in a flat array of doubles that is overwritten in a
+    circle, so a device costs the same memory however long it stays around.
+    """
+    __slots__ = ('times', 'head', 'count')
+
+    def __init__(self, size):
+        self.times = array('d', bytes(16 * size))
+        self.head = 0
+        self.count = 0
+
+    def seen(self, when, gap):
+        """Extend the current session, or start a new one after `gap` seconds."""
+        size = len(self.times) // 2
+        last = (self.head - 1) % size
+        if self.count and when - self.times[2 * last + 1] <= gap:
+            self.times[2 * last + 1] = max(when, self.times[2 * last + 1])
+            return
+        self.times[2 * self.head] = when
+        self.times[2 * self.head + 1] = when
+        self.head = (self.head + 1) % size
+        self.count = min(self.count + 1, size)
+
+    def sessions(self):
+        """Return sessions newest first."""
+        size = len(self.times) // 2
+        slots = ((self.head - 1 - i) % size for i in range(self.count))
+        return [
+            {'first_seen': self.times[2 * slot], 'last_seen': self.times[2 * slot + 1]}
+            for slot in slots
+        ]
+
+
+class DeviceHistory:
+    """Bounded first/last-seen history for every device the scanner finds.
+
+    Each MAC keeps up to `sessions` sessions; a device unseen for
+    longer than `gap` seconds starts a new one. Only the `max_devices` most
+    recently seen MACs are kept.
+    """
+
+    def __init__(self, sessions=16, gap=600, max_devices=4096):
+        self.size = sessions
+        self.gap = gap
+        self.max_devices = max_devices
+        self._rings = OrderedDict()
+
+    def seen(self, mac, when):
+        ring = self._rings.get(mac)
+        if ring is None:
+            if len(self._rings) >= self.max_devices:
+                self._rings.popitem(last=False)
+            ring = self._rings[mac] = SessionRing(self.size)
+        else:
+            self._rings.move_to_end(mac)
+        ring.seen(when, self.gap)
+
+    def get(self, mac):
+        """Return a MAC's sessions, newest first, or None if never seen."""
+        ring = self._rings.get(mac)
+        return ring.sessions() if ring else None
+
+
+class ChangeLog:
+    """Numbered log of device list changes for incremental clients.
+
+    Works like the event bus buffer: each change gets the next cursor, the
+    last `size` are kept, and a client too far behind has to start over.
+    """
+
+    def __init__(self, size=2000):
+        self._changes = deque(maxlen=size)
+        self.cursor = 0
+
+    def record(self, changes):
+        for change in changes:
+            self.cursor += 1
+            change['cursor'] = self.cursor
+            self._changes.append(change)
+
+    def since(self, cursor):
+        """Return changes after `cursor`, or None if some were already dropped."""
+        if cursor > self.cursor:
+            return None
+        if cursor < self.cursor and (not self._changes or self._changes[0]['cursor'] > cursor + 1):
+            return None
+        return [change for change in self._changes if change['cursor'] > cursor]
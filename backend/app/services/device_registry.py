@@ -0,0 +1,68 @@
+import json
+import os
+import threading
+import time
+from ..utils.db import connect
+from ..utils.profiling import span
+
+
+class DeviceRegistry:
+    """Known devices and their custom names.
+
+    Rows live in a SQLite table (WAL mode) so every write is an atomic,
+    crash-safe commit, while reads are served from an in-memory copy that
+    is loaded once at startup.
+    """
+
+    def __init__(self, db_path, legacy_json=None):
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS devices ('
+                'mac TEXT PRIMARY KEY, name TEXT, updated_at REAL NOT NULL)'
+            )
+        if legacy_json:
+            self._migrate_json(legacy_json)
+
+        rows = self._conn.execute('SELECT mac, name FROM devices').fetchall()
+        self._devices = {mac: {'name': name} for mac, name in rows}
+
+    def _migrate_json(self, path):
+        """Import an old devices.json once, then move it out of the way."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            legacy = {}
+
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO devices (mac, name, updated_at) VALUES (?, ?, ?)',
+                [(mac.upper(), info.get('name'), now) for mac, info in legacy.items()]
+            )
+        os.replace(path, path + '.migrated')
+
+    def get(self, mac):
+        """Return the stored info for a MAC, or None."""
+        info = self._devices.get(mac)
+        return dict(info) if info else None
+
+    def all(self):
+        """Return a copy of every known device, keyed by MAC."""
+        return {mac: dict(info) for mac, info in self._devices.items()}
+
+    def set_name(self, mac, name):
+        """Store a custom name for a device."""
+        with span('db.write', 'devices'), self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'INSERT INTO devices (mac, name, updated_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(mac) DO UPDATE SET name = excluded.name, '
+                    'updated_at = excluded.updated_at',
+                    (mac, name, time.time())
+                )
+            self._devices[mac] = {'name': name}
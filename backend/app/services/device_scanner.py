@@ -1,150 +1,550 @@
+import ipaddress
 import subprocess
-import re
-import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from ..config import Config
+from ..utils import metrics
+from ..utils.oui import OuiDatabase
+from ..utils.parsing import parse_arp_scan, parse_arp_table
+from ..utils.process import run_command
+from ..utils.profiling import span
+from .device_history import ChangeLog, DeviceHistory
+from .device_registry import DeviceRegistry
+from .passive_discovery import PassiveDiscovery
+from .presence import PresenceTracker
+
+
+SCAN_DURATION = metrics.histogram(
+    'armas_scan_duration_seconds', 'Time for a full arp-scan sweep of every shard.'
+)
+REFRESH_DURATION = metrics.histogram(
+    'armas_refresh_duration_seconds', 'Time to refresh the device list.', ['swept']
+)
+SHARD_FAILURES = metrics.counter(
+    'armas_scan_shard_failures_total', 'arp-scan shards that failed or timed out.', ['reason']
+)
+SCAN_FALLBACKS = metrics.counter(
+    'armas_scan_fallbacks_total', 'Sweeps that fell back to the ARP table for failed shards.'
+)
+
+
+def parse_scan_targets(value, interface, network_range):
+    """Parse SCAN_TARGETS ('eth0=10.0.0.0/16,eth0.20=10.20.0.0/24').
+
+    An empty value means NETWORK_RANGE on NETWORK_INTERFACE. An entry with
+    no interface uses NETWORK_INTERFACE.
+    """
+    targets = []
+    for entry in (value or network_range).split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        iface, _, cidr = entry.rpartition('=')
+        targets.append((iface or interface, ipaddress.ip_network(cidr, strict=False)))
+    return targets
+
+
+def shard_targets(targets, prefix):
+    """Split each (interface, network) into shards no bigger than /prefix."""
+    shards = []
+    for iface, network in targets:
+        if network.prefixlen < prefix:
+            shards += [(iface, subnet) for subnet in network.subnets(new_prefix=prefix)]
+        else:
+            shards.append((iface, network))
+    return shards
+
+
+class DeviceRecord:
+    """Compact cache entry for one device, keyed by MAC in the index."""
+    __slots__ = ('mac', 'ip', 'name', 'vendor', 'last_seen')
+
+    def __init__(self, mac, ip, name, vendor, last_seen):
+        self.mac = mac
+        self.ip = ip
+        self.name = name
+        self.vendor = vendor
+        self.last_seen = last_seen
+
+    def update(self, device, now):
+        """Fold a newer sighting into the record, keeping known values."""
+        self.last_seen = now
+        for key in ('ip', 'vendor'):
+            value = device.get(key)
+            if value and value != 'Unknown':
+                setattr(self, key, value)
+        # A name that is just the vendor should not replace a hostname
+        name = device.get('name')
+        if name and name != 'Unknown' and (name != device.get('vendor') or self.name == 'Unknown'):
+            self.name = name
+
+    def to_dict(self):
+        return {'mac': self.mac, 'ip': self.ip, 'name': self.name, 'vendor': self.vendor}
 
 
 class DeviceScanner:
-    def __init__(self):
+    def __init__(self, events=None):
+        self.events = events
         self.network_range = Config.NETWORK_RANGE
         self.interface = Config.NETWORK_INTERFACE
-        self.data_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
-        self.devices_file = os.path.join(self.data_dir, 'devices.json')
-        self._ensure_data_dir()
-
-    def _ensure_data_dir(self):
-        """Ensure data directory exists."""
-        os.makedirs(self.data_dir, exist_ok=True)
-        if not os.path.exists(self.devices_file):
-            self._save_known_devices({})
-
-    def _load_known_devices(self):
-        """Load known devices with custom names."""
+        self.shards = shard_targets(
+            parse_scan_targets(Config.SCAN_TARGETS, self.interface, self.network_range),
+            Config.SCAN_SHARD_PREFIX
+        )
+        self.scan_workers = max(1, min(Config.SCAN_WORKERS, len(self.shards)))
+        self.shard_timeout = Config.SCAN_SHARD_TIMEOUT
+        self.last_scan = None
+        self.registry = DeviceRegistry(
+            Config.DATABASE_PATH,
+            legacy_json=os.path.join(Config.DATA_DIR, 'devices.json')
+        )
+        self.scan_interval = Config.SCAN_INTERVAL
+        self.discovery_mode = Config.DISCOVERY_MODE
+        self.active_scan_interval = Config.ACTIVE_SCAN_INTERVAL
+        self.device_ttl = Config.DEVICE_TTL
+        self.oui = OuiDatabase(Config.OUI_DB_PATH)
+        self.passive = PassiveDiscovery(
+            interface=self.interface,
+            arp_path=Config.ARP_TABLE_PATH,
+            leases_file=Config.DHCP_LEASES_FILE or None
+        )
+        self.presence = PresenceTracker(self.interface, Config.PRESENCE_MODE, events=events)
+
+        # Device index (MAC -> DeviceRecord), refreshed in the background
+        self._index = {}
+        # MAC -> IP as of the last index update, to diff the next one against
+        self._snapshot = {}
+        self.changes = ChangeLog(Config.DEVICE_CHANGE_LOG_SIZE)
+        self.history = DeviceHistory(
+            sessions=Config.DEVICE_HISTORY_SESSIONS,
+            gap=self.device_ttl,
+            max_devices=Config.DEVICE_HISTORY_LIMIT
+        )
+        self._scanned_at = None
+        self._active_at = None
+        # Set by the first refresh; until then the index may be a snapshot
+        self._live = threading.Event()
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._stop = threading.Event()
+        self._worker = None
+
+    def _scan_shard(self, iface, network):
+        """arp-scan one shard. Raises RuntimeError if it fails or times out."""
+        cmd = ['sudo', 'arp-scan', '--interface', iface, str(network)]
         try:
-            with open(self.devices_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def _save_known_devices(self, devices):
-        """Save known devices to file."""
-        with open(self.devices_file, 'w') as f:
-            json.dump(devices, f, indent=2)
-
-    def scan_network(self):
-        """Scan network for connected devices using arp-scan."""
+            result = run_command(cmd, timeout=self.shard_timeout)
+        except subprocess.TimeoutExpired:
+            SHARD_FAILURES.inc(reason='timeout')
+            raise RuntimeError('timed out')
+        if result.returncode != 0:
+            SHARD_FAILURES.inc(reason='error')
+            raise RuntimeError(result.stderr.strip() or f'exit code {result.returncode}')
+        return parse_arp_scan(result.stdout)
+
+    def scan_network(self, on_shard=None):
+        """Scan network for connected devices using arp-scan.
+
+        The scan targets are split into shards that are scanned in parallel
+        and merged as each one finishes; `on_shard` is called with every
+        shard's devices as they come in. Shards that fail are filled in from
+        the ARP table, and the outcome is kept in `last_scan`.
+        """
+        started = time.time()
         devices = []
+        seen = set()
+        failed = []
 
-        # Try arp-scan first (faster and more reliable)
-        try:
-            cmd = ['sudo', 'arp-scan', '--interface', self.interface, self.network_range]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        with span('scan.arp-scan', f'{len(self.shards)} shard(s)'), \
+                ThreadPoolExecutor(max_workers=self.scan_workers) as pool:
+            futures = {
+                pool.submit(self._scan_shard, iface, network): (iface, network)
+                for iface, network in self.shards
+            }
+            for future in as_completed(futures):
+                iface, network = futures[future]
+                try:
+                    found = [d for d in future.result() if d['mac'] not in seen]
+                except RuntimeError as e:
+                    failed.append({'interface': iface, 'network': str(network), 'error': str(e)})
+                    continue
+                seen.update(d['mac'] for d in found)
+                devices += found
+                if on_shard and found:
+                    on_shard(self._apply_known_names(found))
 
-            if result.returncode == 0:
-                devices = self._parse_arp_scan(result.stdout)
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            pass
+        # Fallback to arp table for the shards arp-scan could not cover
+        if failed:
+            SCAN_FALLBACKS.inc()
+            missing = [ipaddress.ip_network(shard['network']) for shard in failed]
+            for device in self._get_arp_table():
+                if device['mac'] in seen:
+                    continue
+                try:
+                    ip = ipaddress.ip_address(device['ip'])
+                except ValueError:
+                    continue
+                if any(ip in network for network in missing):
+                    seen.add(device['mac'])
+                    devices.append(device)
 
-        # Fallback to arp table if arp-scan fails
-        if not devices:
-            devices = self._get_arp_table()
+        SCAN_DURATION.observe(time.time() - started)
+        self.last_scan = {
+            'shards': len(self.shards),
+            'failed': sorted(failed, key=lambda shard: shard['network']),
+            'partial': bool(failed),
+            'devices': len(devices),
+            'duration': round(time.time() - started, 2),
+            'finished_at': time.time()
+        }
+        return self._apply_known_names(devices)
 
-        # Deduplicate by MAC address (keep first occurrence)
-        seen_macs = set()
-        unique_devices = []
+    def _apply_known_names(self, devices):
+        """Merge with known device names (custom names take priority).
+
+        Devices without a vendor get one from the OUI database, and an
+        unnamed device is shown by its vendor as arp-scan does.
+        """
         for device in devices:
-            mac = device['mac'].upper()
-            if mac not in seen_macs:
-                seen_macs.add(mac)
-                unique_devices.append(device)
-
-        # Merge with known device names (custom names take priority)
-        known = self._load_known_devices()
-        for device in unique_devices:
-            mac = device['mac'].upper()
-            if mac in known and known[mac].get('name'):
-                device['name'] = known[mac]['name']
-
-        return unique_devices
-
-    def _parse_arp_scan(self, output):
-        """Parse arp-scan output."""
-        devices = []
-        seen_macs = set()
-        mac_pattern = re.compile(r'([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}')
-        ip_pattern = re.compile(r'\d+\.\d+\.\d+\.\d+')
+            if device['vendor'] in ('Unknown', '(Unknown)', ''):
+                vendor = self.oui.lookup(device['mac'])
+                if vendor:
+                    device['vendor'] = vendor
+                    if device['name'] == 'Unknown':
+                        device['name'] = vendor
+            known = self.registry.get(device['mac'])
+            if known and known.get('name'):
+                device['name'] = known['name']
+        return devices
 
-        for line in output.split('\n'):
-            # Skip duplicate lines marked by arp-scan
-            if 'DUP:' in line:
-                continue
+    def _collect(self, full):
+        """Gather devices for one refresh according to the discovery mode.
 
-            mac_match = mac_pattern.search(line)
-            ip_match = ip_pattern.search(line)
+        Returns (devices, swept) where swept tells whether an active
+        arp-scan was part of it.
+        """
+        if self.discovery_mode == 'active':
+            return self.scan_network(self._merge_shard), True
 
-            if mac_match and ip_match:
-                mac = mac_match.group(0).upper()
+        with span('scan.passive'):
+            devices = self._apply_known_names(self.passive.discover())
+        if self.discovery_mode == 'hybrid':
+            sweep_due = (
+                self._active_at is None
+                or time.time() - self._active_at >= self.active_scan_interval
+            )
+            if full or sweep_due:
+                return self.scan_network(self._merge_shard) + devices, True
+        return devices, False
 
-                # Skip if we've already seen this MAC
-                if mac in seen_macs:
-                    continue
-                seen_macs.add(mac)
+    def _merge(self, found, replace):
+        """Return the device index with freshly found devices merged in.
+
+        Active-only mode replaces the index with each scan. Otherwise
+        devices stay listed until they have gone unseen for DEVICE_TTL.
+        Must be called with the lock held.
+        """
+        now = time.time()
+        if replace:
+            index = {}
+        else:
+            index = {
+                mac: record for mac, record in self._index.items()
+                if now - record.last_seen <= self.device_ttl
+            }
 
-                # Extract vendor info if present
-                parts = line.split('\t')
-                vendor = parts[2].strip() if len(parts) > 2 else 'Unknown'
+        for device in found:
+            self.history.seen(device['mac'], now)
+            record = index.get(device['mac'])
+            if record is None:
+                index[device['mac']] = DeviceRecord(
+                    device['mac'], device['ip'], device['name'], device['vendor'], now
+                )
+            else:
+                record.update(device, now)
+        return index
 
-                devices.append({
-                    'mac': mac,
-                    'ip': ip_match.group(0),
-                    'name': vendor if vendor != '(Unknown)' else 'Unknown',
-                    'vendor': vendor
+    def _merge_shard(self, devices):
+        """Show devices from a finished shard before the whole scan is done."""
+        self.presence.seen(devices)
+        with self._lock:
+            changes = self._set_index(self._merge(devices, replace=False))
+        self._publish_changes(changes)
+
+    def start(self):
+        """Start the background worker that keeps the scan cache fresh."""
+        if self._worker and self._worker.is_alive():
+            return
+        self.presence.start()
+        self._stop.clear()
+        self._worker = threading.Thread(
+            target=self._refresh_loop, name='device-scanner', daemon=True
+        )
+        self._worker.start()
+
+    def stop(self):
+        """Stop the background worker."""
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Background scan failed: {e}")
+            self._stop.wait(self.scan_interval)
+
+    def refresh(self, full=False):
+        """Rediscover devices and update the cache.
+
+        `full` forces an active arp-scan sweep in hybrid mode. If a refresh
+        is already running, wait for it and share its result instead of
+        starting another one.
+        """
+        with self._lock:
+            inflight = self._inflight
+            if inflight is None:
+                self._inflight = threading.Event()
+
+        if inflight is not None:
+            inflight.wait()
+            return self.get_cached()[0]
+
+        started = time.perf_counter()
+        try:
+            with span('scan.refresh', 'full' if full else None):
+                found, swept = self._collect(full)
+            self.presence.seen(found)
+            with self._lock:
+                changes = self._set_index(
+                    self._merge(found, replace=self.discovery_mode == 'active')
+                )
+                self._scanned_at = time.time()
+                if swept:
+                    self._active_at = self._scanned_at
+            self._live.set()
+            self._publish_changes(changes)
+            REFRESH_DURATION.observe(time.perf_counter() - started, swept=str(swept).lower())
+        finally:
+            with self._lock:
+                done, self._inflight = self._inflight, None
+            done.set()
+
+        return self.get_cached()[0]
+
+    def restore(self, devices, scanned_at):
+        """Serve devices saved by export() until the first refresh finishes.
+
+        The cache age counts from `scanned_at`, so an old snapshot is
+        refreshed on the first request as well as by the worker.
+        """
+        with self._lock:
+            if self._live.is_set():
+                return
+            self._set_index({
+                device['mac']: DeviceRecord(
+                    device['mac'], device['ip'], device['name'], device['vendor'],
+                    device['last_seen']
+                )
+                for device in devices
+            })
+            self._scanned_at = scanned_at
+
+    def export(self):
+        """Return (devices with last_seen, scan time) for a snapshot."""
+        with self._lock:
+            devices = [
+                dict(record.to_dict(), last_seen=record.last_seen)
+                for record in self._index.values()
+            ]
+            return devices, self._scanned_at
+
+    @property
+    def stale(self):
+        """True while the device list comes from a snapshot, not a scan."""
+        return self._scanned_at is not None and not self._live.is_set()
+
+    def wait_live(self, timeout=None):
+        """Wait for the first refresh; returns False on timeout."""
+        return self._live.wait(timeout)
+
+    def _set_index(self, index):
+        """Swap in a new index and log how it differs from the previous one.
+
+        Records are updated in place, so the comparison is against a MAC to
+        IP snapshot taken at the last update. Must be called with the lock
+        held; returns the new changes.
+        """
+        snapshot = {mac: record.ip for mac, record in index.items()}
+        changes = []
+        for mac, ip in snapshot.items():
+            if mac not in self._snapshot:
+                changes.append({'type': 'added', 'mac': mac, 'device': index[mac].to_dict()})
+            elif ip != self._snapshot[mac]:
+                changes.append({
+                    'type': 'ip_changed', 'mac': mac, 'device': index[mac].to_dict(),
+                    'previous_ip': self._snapshot[mac]
                 })
+        for mac in self._snapshot.keys() - snapshot.keys():
+            changes.append({'type': 'removed', 'mac': mac})
 
-        return devices
+        self._index = index
+        self._snapshot = snapshot
+        self.changes.record(changes)
+        return changes
+
+    def _publish_changes(self, changes):
+        """Publish devices that joined, left or moved in the inventory."""
+        if not self.events:
+            return
+        for change in changes:
+            if change['type'] == 'added':
+                self.events.publish('device_seen', change['device'])
+            elif change['type'] == 'ip_changed':
+                self.events.publish('device_changed', change['device'])
+            else:
+                self.events.publish('device_lost', {'mac': change['mac']})
+
+    def refresh_async(self):
+        """Start a refresh in the background unless one is already running."""
+        if self._inflight is None:
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def cache_age(self):
+        """Seconds since the last refresh finished, or None before the first."""
+        scanned_at = self._scanned_at
+        return time.time() - scanned_at if scanned_at is not None else None
+
+    def get_cached(self):
+        """Return (devices, age in seconds) from the cache as-is.
+
+        The age is None when no scan has finished yet.
+        """
+        with self._lock:
+            devices = [record.to_dict() for record in self._index.values()]
+            scanned_at = self._scanned_at
+        for device in devices:
+            device['online'] = self.presence.is_online(device['mac'], default=True)
+        age = time.time() - scanned_at if scanned_at is not None else None
+        return devices, age
+
+    def get_changes(self, cursor):
+        """Return (changes after `cursor`, current cursor).
+
+        The changes are None when the cursor is too old (or from before a
+        restart) and the client has to reload the full list.
+        """
+        with self._lock:
+            changes = self.changes.since(cursor)
+            current = self.changes.cursor
+            stale = self._scanned_at is not None and time.time() - self._scanned_at > self.scan_interval
+        if stale:
+            self.refresh_async()
+        if changes is None:
+            return None, current
+
+        changes = [dict(change) for change in changes]
+        for change in changes:
+            if 'device' in change:
+                change['device'] = dict(
+                    change['device'],
+                    online=self.presence.is_online(change['mac'], default=True)
+                )
+        return changes, current
+
+    def get_history(self, mac):
+        """Return a device's (first_seen, last_seen) sessions, newest first."""
+        mac = mac.upper().replace('-', ':')
+        with self._lock:
+            return self.history.get(mac)
+
+    def get_devices(self):
+        """Return (devices, cache age) without waiting on a scan.
+
+        A stale cache is served immediately while a refresh runs in the
+        background. Only a cold cache waits for the first scan.
+        """
+        devices, age = self.get_cached()
+        if age is None:
+            self.refresh()
+            devices, age = self.get_cached()
+        elif age > self.scan_interval:
+            self.refresh_async()
+        return devices, age
 
     def _get_arp_table(self):
         """Get devices from ARP table as fallback."""
-        devices = []
-        cmd = ['arp', '-a']
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        mac_pattern = re.compile(r'([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}')
-        ip_pattern = re.compile(r'\d+\.\d+\.\d+\.\d+')
-
-        for line in result.stdout.split('\n'):
-            mac_match = mac_pattern.search(line)
-            ip_match = ip_pattern.search(line)
-
-            if mac_match and ip_match:
-                devices.append({
-                    'mac': mac_match.group(0).upper(),
-                    'ip': ip_match.group(0),
-                    'name': 'Unknown',
-                    'vendor': 'Unknown'
-                })
+        if os.path.exists(self.passive.arp_path):
+            return [
+                {'mac': mac, 'ip': ip, 'name': 'Unknown', 'vendor': 'Unknown'}
+                for mac, ip in self.passive.read_arp_table().items()
+            ]
 
-        return devices
+        result = run_command(['arp', '-a'], timeout=10)
+        with span('parse.arp'):
+            return parse_arp_table(result.stdout)
+
+    def probe_device(self, mac):
+        """Refresh one device with an arp-scan of just its last known IP.
 
-    def get_device(self, mac):
-        """Get info for a specific device."""
+        Returns True if the device answered.
+        """
         mac = mac.upper().replace('-', ':')
-        devices = self.scan_network()
+        with self._lock:
+            record = self._index.get(mac)
+            ip = record.ip if record else None
+        if not ip:
+            presence = self.presence.get(mac)
+            ip = presence['ip'] if presence else None
+        if not ip or ip == 'Unknown':
+            return False
 
-        for device in devices:
-            if device['mac'] == mac:
-                return device
+        try:
+            cmd = ['sudo', 'arp-scan', '--interface', self.interface, ip]
+            result = run_command(cmd, timeout=5)
+        except subprocess.TimeoutExpired:
+            return False
+
+        with span('parse.arp-scan'):
+            found = [d for d in parse_arp_scan(result.stdout) if d['mac'] == mac]
+        self.presence.update(mac, bool(found), ip)
+        if found:
+            with self._lock:
+                changes = self._set_index(self._merge(self._apply_known_names(found), replace=False))
+            self._publish_changes(changes)
+        return bool(found)
+
+    def get_device(self, mac, probe=False):
+        """Get info for a specific device from the index.
 
-        # Device not found in scan, check known devices
-        known = self._load_known_devices()
-        if mac in known:
+        With `probe`, the device's last known IP is re-checked first;
+        this never sweeps the whole network.
+        """
+        mac = mac.upper().replace('-', ':')
+        if self._scanned_at is None:
+            self.get_devices()
+        if probe:
+            self.probe_device(mac)
+
+        with self._lock:
+            record = self._index.get(mac)
+            device = record.to_dict() if record else None
+        if device:
+            device['online'] = self.presence.is_online(mac, default=True)
+            return device
+
+        # Not in the inventory, but the kernel may have seen it since
+        presence = self.presence.get(mac)
+        known = self.registry.get(mac)
+        if presence or known:
             return {
                 'mac': mac,
-                'ip': 'Unknown',
-                'name': known[mac].get('name', 'Unknown'),
+                'ip': presence['ip'] if presence and presence['ip'] else 'Unknown',
+                'name': (known or {}).get('name') or 'Unknown',
                 'vendor': 'Unknown',
-                'online': False
+                'online': bool(presence and presence['online'])
             }
 
         return None
@@ -152,7 +552,12 @@ class DeviceScanner:
     def set_device_name(self, mac, name):
         """Set a custom name for a device."""
         mac = mac.upper().replace('-', ':')
-        known = self._load_known_devices()
-        known[mac] = {'name': name}
-        self._save_known_devices(known)
+        self.registry.set_name(mac, name)
+
+        with self._lock:
+            record = self._index.get(mac)
+            if record:
+                record.name = name
+                # Let incremental clients pick up the new name too
+                self.changes.record([{'type': 'renamed', 'mac': mac, 'device': record.to_dict()}])
         return True
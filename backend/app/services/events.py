@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import deque
+
+
+class EventBus:
+    """In-process pub/sub for state changes, with a replay buffer.
+
+    Every event gets an increasing ID. The last `buffer_size` events are
+    kept so a reconnecting client can resume from its Last-Event-ID
+    instead of reloading everything.
+    """
+
+    def __init__(self, buffer_size=500):
+        self._events = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._cond = threading.Condition()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event_type, data):
+        """Record an event and wake up every waiting subscriber."""
+        with self._cond:
+            self._last_id += 1
+            self._events.append({
+                'id': self._last_id,
+                'type': event_type,
+                'data': data,
+                'time': time.time()
+            })
+            self._cond.notify_all()
+
+    def since(self, last_id):
+        """Return events after `last_id`, or None if some were already dropped."""
+        with self._cond:
+            if last_id > self._last_id:
+                return None
+            if last_id < self._last_id and (not self._events or self._events[0]['id'] > last_id + 1):
+                return None
+            return [event for event in self._events if event['id'] > last_id]
+
+    def wait(self, last_id, timeout):
+        """Block until there are events after `last_id` or `timeout` passes."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._last_id > last_id, timeout)
+        return self.since(last_id)
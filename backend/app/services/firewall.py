@@ -0,0 +1,138 @@
+import re
+from ..utils.parsing import parse_block_rules
+from ..utils.process import run_command
+
+SET_MAC_PATTERN = re.compile(r'^add\s+\S+\s+((?:[0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2})', re.MULTILINE)
+
+
+def iptables(*args):
+    """Run a single iptables command."""
+    return run_command(['sudo', 'iptables', *args])
+
+
+def mac_rule_spec(mac):
+    """Rule arguments that drop traffic from a MAC address."""
+    return ['-m', 'mac', '--mac-source', mac, '-j', 'DROP']
+
+
+def ensure_chain(chain):
+    """Create a chain and jump to it from FORWARD if not already done."""
+    # -N fails when the chain already exists, which is fine
+    iptables('-N', chain)
+    if iptables('-C', 'FORWARD', '-j', chain).returncode != 0:
+        iptables('-I', 'FORWARD', '-j', chain)
+
+
+class IptablesBackend:
+    """One DROP rule per blocked MAC in a dedicated chain.
+
+    Simple and needs nothing beyond iptables, but every forwarded packet is
+    checked against each rule in turn.
+    """
+
+    def __init__(self, chain):
+        self.chain = chain
+
+    def setup(self):
+        """Create the chain and migrate rules left directly in FORWARD."""
+        ensure_chain(self.chain)
+
+        result = iptables('-S', 'FORWARD')
+        if result.returncode != 0:
+            return
+
+        migrated = set()
+        for mac, rule in parse_block_rules(result.stdout):
+            iptables('-D', 'FORWARD', *rule)
+            if mac not in migrated:
+                migrated.add(mac)
+                if iptables('-C', self.chain, *mac_rule_spec(mac)).returncode != 0:
+                    iptables('-A', self.chain, *mac_rule_spec(mac))
+
+    def list_blocked(self):
+        """Return the set of blocked MACs, or None if the chain can't be read.
+
+        Duplicate rules are removed so each MAC has exactly one.
+        """
+        result = iptables('-S', self.chain)
+        if result.returncode != 0:
+            return None
+
+        blocked = set()
+        for mac, rule in parse_block_rules(result.stdout):
+            if mac in blocked:
+                iptables('-D', self.chain, *rule)
+            else:
+                blocked.add(mac)
+        return blocked
+
+    def apply(self, add, remove):
+        """Add and remove MAC rules in one iptables-restore transaction."""
+        lines = [' '.join(['-A', self.chain, *mac_rule_spec(mac)]) for mac in add]
+        lines += [' '.join(['-D', self.chain, *mac_rule_spec(mac)]) for mac in remove]
+        ruleset = '\n'.join(['*filter', *lines, 'COMMIT', ''])
+        result = run_command(['sudo', 'iptables-restore', '--noflush'], input=ruleset)
+        return result.returncode == 0
+
+
+class IpsetBackend:
+    """Blocked MACs kept in an ipset hash:mac behind a single DROP rule.
+
+    Blocking and unblocking only add or remove set members, and the kernel
+    checks membership with a hash lookup however many devices are blocked.
+    """
+
+    def __init__(self, chain, set_name):
+        self.chain = chain
+        self.set_name = set_name
+
+    def _ipset(self, *args, input=None):
+        return run_command(['sudo', 'ipset', *args], input=input)
+
+    def _set_rule_spec(self):
+        return ['-m', 'set', '--match-set', self.set_name, 'src', '-j', 'DROP']
+
+    def setup(self):
+        """Create the set and its match rule, and fold per-MAC rules into it."""
+        self._ipset('create', self.set_name, 'hash:mac', '-exist')
+        ensure_chain(self.chain)
+
+        # Per-MAC rules from the iptables backend (in our chain or left in
+        # FORWARD by older versions) become set members. The set rule goes in
+        # before the old rules come out so nothing is briefly unblocked.
+        legacy = []
+        for chain in (self.chain, 'FORWARD'):
+            result = iptables('-S', chain)
+            if result.returncode == 0:
+                legacy += [(chain, mac, rule) for mac, rule in parse_block_rules(result.stdout)]
+        if legacy:
+            self.apply(sorted({mac for _, mac, _ in legacy}), [])
+
+        if iptables('-C', self.chain, *self._set_rule_spec()).returncode != 0:
+            iptables('-A', self.chain, *self._set_rule_spec())
+
+        for chain, _, rule in legacy:
+            iptables('-D', chain, *rule)
+
+    def list_blocked(self):
+        """Return the set of blocked MACs, or None if the set can't be read."""
+        result = self._ipset('save', self.set_name)
+        if result.returncode != 0:
+            return None
+        return {mac.upper() for mac in SET_MAC_PATTERN.findall(result.stdout)}
+
+    def apply(self, add, remove):
+        """Add and remove set members in one ipset restore run."""
+        lines = [f'add {self.set_name} {mac}' for mac in add]
+        lines += [f'del {self.set_name} {mac}' for mac in remove]
+        result = self._ipset('restore', '-exist', input='\n'.join(lines) + '\n')
+        return result.returncode == 0
+
+
+def create_backend(name, chain, set_name):
+    """Build the firewall backend selected in the config."""
+    if name == 'iptables':
+        return IptablesBackend(chain)
+    if name == 'ipset':
+        return IpsetBackend(chain, set_name)
+    raise ValueError(f'Unknown firewall backend: {name}')
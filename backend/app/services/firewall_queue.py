@@ -0,0 +1,59 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class FirewallQueue:
+    """Single writer for firewall changes.
+
+    Callers queue block/unblock requests and get a Future back. One worker
+    thread drains the queue: requests arriving within `window` seconds of
+    each other are coalesced per MAC (the last request wins, so a block
+    followed by an unblock cancels out) and flushed as one batch.
+    """
+
+    def __init__(self, flush, window=0.05):
+        self._flush = flush
+        self.window = window
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='firewall-writer', daemon=True)
+        self._worker.start()
+
+    def submit(self, mac, block):
+        """Queue a change for a normalized MAC and return its Future."""
+        future = Future()
+        self._queue.put((mac, block, future))
+        return future
+
+    def _collect(self):
+        """Wait for one request, then gather whatever arrives in the window."""
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+
+            wanted = {}
+            for mac, block, _ in pending:
+                wanted[mac] = block
+
+            try:
+                results = self._flush(wanted)
+            except Exception as e:
+                for _, _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            for mac, _, future in pending:
+                future.set_result(dict(results[mac]))
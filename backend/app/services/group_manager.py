@@ -0,0 +1,335 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from apscheduler.triggers.date import DateTrigger
+from ..utils.db import connect
+
+
+class GroupManager:
+    """Named groups of devices (kids, guests, IoT) that act as one.
+
+    Membership is kept in memory in both directions, group -> MACs and
+    MAC -> groups, so either lookup is a dict access. Blocking a group is a
+    single firewall batch and a group timer is a single scheduler job,
+    however many devices the group has.
+    """
+
+    JOB_PREFIX = 'group_timer_'
+
+    def __init__(self, wifi_controller, timers, db_path, events=None, on_change=None):
+        self.wifi_controller = wifi_controller
+        self.timers = timers
+        self.events = events
+        self.on_change = on_change
+        self._lock = threading.RLock()
+        # Bumped on every change to groups, members or group timers
+        self.version = 0
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS device_groups ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, '
+                'created_at REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS group_members ('
+                'group_id INTEGER NOT NULL, '
+                'mac TEXT NOT NULL, PRIMARY KEY (group_id, mac))'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS group_members_mac ON group_members (mac)'
+            )
+
+        self._names = dict(self._conn.execute('SELECT id, name FROM device_groups'))
+        self._members = {group_id: set() for group_id in self._names}
+        self._groups_of = {}
+        for group_id, mac in self._conn.execute('SELECT group_id, mac FROM group_members'):
+            self._members[group_id].add(mac)
+            self._groups_of.setdefault(mac, set()).add(group_id)
+        # Groups whose timer ran out while the service was down
+        self._expired = []
+
+    def _publish(self, event_type, data):
+        # Every change is published, so this is where the version moves
+        self.version += 1
+        if self.events:
+            self.events.publish(event_type, data)
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    # Groups and membership
+
+    def create_group(self, name, macs=None):
+        """Create a group, optionally with initial members."""
+        name = self._validate_name(name)
+        macs = self._validate_macs(macs or [])
+
+        with self._lock:
+            try:
+                with self._conn:
+                    cursor = self._conn.execute(
+                        'INSERT INTO device_groups (name, created_at) VALUES (?, ?)',
+                        (name, time.time())
+                    )
+                    group_id = cursor.lastrowid
+                    self._conn.executemany(
+                        'INSERT INTO group_members (group_id, mac) VALUES (?, ?)',
+                        [(group_id, mac) for mac in macs]
+                    )
+            except sqlite3.IntegrityError:
+                raise ValueError(f'A group named {name} already exists')
+
+            self._names[group_id] = name
+            self._members[group_id] = set()
+            self._index(group_id, macs)
+            group = self._group_info(group_id)
+        self._publish('group_updated', group)
+        self._changed()
+        return group
+
+    def update_group(self, group_id, name=None, macs=None):
+        """Rename a group and/or replace its member list. None if not found."""
+        name = self._validate_name(name) if name is not None else None
+        macs = self._validate_macs(macs) if macs is not None else None
+
+        with self._lock:
+            if group_id not in self._names:
+                return None
+            try:
+                with self._conn:
+                    if name is not None:
+                        self._conn.execute(
+                            'UPDATE device_groups SET name = ? WHERE id = ?', (name, group_id)
+                        )
+                    if macs is not None:
+                        self._conn.execute(
+                            'DELETE FROM group_members WHERE group_id = ?', (group_id,)
+                        )
+                        self._conn.executemany(
+                            'INSERT INTO group_members (group_id, mac) VALUES (?, ?)',
+                            [(group_id, mac) for mac in macs]
+                        )
+            except sqlite3.IntegrityError:
+                raise ValueError(f'A group named {name} already exists')
+
+            if name is not None:
+                self._names[group_id] = name
+            if macs is not None:
+                self._unindex(group_id, list(self._members[group_id]))
+                self._index(group_id, macs)
+            group = self._group_info(group_id)
+        self._publish('group_updated', group)
+        if macs is not None:
+            self._changed()
+        return group
+
+    def add_members(self, group_id, macs):
+        """Add devices to a group. None if the group does not exist."""
+        macs = self._validate_macs(macs)
+        with self._lock:
+            if group_id not in self._names:
+                return None
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO group_members (group_id, mac) VALUES (?, ?)',
+                    [(group_id, mac) for mac in macs]
+                )
+            self._index(group_id, macs)
+            group = self._group_info(group_id)
+        self._publish('group_updated', group)
+        self._changed()
+        return group
+
+    def remove_members(self, group_id, macs):
+        """Remove devices from a group. None if the group does not exist."""
+        macs = self._validate_macs(macs)
+        with self._lock:
+            if group_id not in self._names:
+                return None
+            with self._conn:
+                self._conn.executemany(
+                    'DELETE FROM group_members WHERE group_id = ? AND mac = ?',
+                    [(group_id, mac) for mac in macs]
+                )
+            self._unindex(group_id, macs)
+            group = self._group_info(group_id)
+        self._publish('group_updated', group)
+        self._changed()
+        return group
+
+    def delete_group(self, group_id):
+        """Delete a group and its timer. Returns False if it did not exist."""
+        with self._lock:
+            if group_id not in self._names:
+                return False
+            self._remove_timer(group_id)
+            with self._conn:
+                self._conn.execute('DELETE FROM group_members WHERE group_id = ?', (group_id,))
+                self._conn.execute('DELETE FROM device_groups WHERE id = ?', (group_id,))
+            self._unindex(group_id, list(self._members[group_id]))
+            del self._members[group_id]
+            del self._names[group_id]
+        self._publish('group_deleted', {'id': group_id})
+        self._changed()
+        return True
+
+    def get_group(self, group_id):
+        with self._lock:
+            if group_id not in self._names:
+                return None
+            return self._group_info(group_id)
+
+    def get_groups(self):
+        with self._lock:
+            return [self._group_info(group_id) for group_id in sorted(self._names)]
+
+    def members(self, group_id):
+        """Return a group's MACs, or None if the group does not exist."""
+        with self._lock:
+            members = self._members.get(group_id)
+            return set(members) if members is not None else None
+
+    def groups_for(self, mac):
+        """Return the IDs of the groups a MAC belongs to."""
+        with self._lock:
+            return sorted(self._groups_of.get(mac.upper().replace('-', ':'), ()))
+
+    def memberships(self):
+        """Return {mac: sorted group IDs} for every device in a group."""
+        with self._lock:
+            return {mac: sorted(groups) for mac, groups in self._groups_of.items()}
+
+    def _index(self, group_id, macs):
+        self._members[group_id].update(macs)
+        for mac in macs:
+            self._groups_of.setdefault(mac, set()).add(group_id)
+
+    def _unindex(self, group_id, macs):
+        self._members[group_id].difference_update(macs)
+        for mac in macs:
+            groups = self._groups_of.get(mac)
+            if groups is not None:
+                groups.discard(group_id)
+                if not groups:
+                    del self._groups_of[mac]
+
+    def _validate_name(self, name):
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError('Group name is required')
+        return name.strip()
+
+    def _validate_macs(self, macs):
+        if not isinstance(macs, list):
+            raise ValueError('Members must be a list of MAC addresses')
+        return sorted({self.wifi_controller.validate_mac(mac) for mac in macs})
+
+    def _group_info(self, group_id):
+        return {
+            'id': group_id,
+            'name': self._names[group_id],
+            'macs': sorted(self._members[group_id]),
+            'count': len(self._members[group_id]),
+            'timer': self._timer_info(group_id)
+        }
+
+    # Bulk actions
+
+    def apply(self, group_id, action):
+        """Block or unblock every member in one firewall batch.
+
+        Like a single-device block, this replaces the group's timer and any
+        timers on its members. Returns None if the group does not exist.
+        """
+        members = self.members(group_id)
+        if members is None:
+            return None
+        with self._lock:
+            self._remove_timer(group_id)
+        self.timers.cancel_timers(members)
+        return self.wifi_controller.apply_batch(sorted(members), action)
+
+    # Group timers
+
+    def _job_id(self, group_id):
+        return f'{self.JOB_PREFIX}{group_id}'
+
+    def restore_timers(self, timers):
+        """Reschedule persisted group timers; ones that ran out wait for catch_up()."""
+        now = datetime.now().timestamp()
+        for timer in timers:
+            if not timer['job_id'].startswith(self.JOB_PREFIX):
+                continue
+            group_id = int(timer['target'])
+            if group_id not in self._names:
+                self.timers.store.delete(timer['job_id'])
+            elif timer['expires_at'] <= now:
+                self._expired.append(group_id)
+            else:
+                self._schedule(group_id, datetime.fromtimestamp(timer['expires_at']))
+
+    def catch_up(self):
+        """Block the groups whose timer expired while stopped."""
+        expired, self._expired = self._expired, []
+        for group_id in expired:
+            self._on_timer_expire(group_id)
+
+    def _schedule(self, group_id, expires_at):
+        self.timers.scheduler.add_job(
+            func=self._on_timer_expire,
+            trigger=DateTrigger(run_date=expires_at),
+            args=[group_id],
+            id=self._job_id(group_id),
+            replace_existing=True
+        )
+
+    def set_timer(self, group_id, minutes):
+        """Block the whole group after `minutes`. None if the group does not exist."""
+        with self._lock:
+            if group_id not in self._names:
+                return None
+            expires_at = datetime.now() + timedelta(minutes=minutes)
+            self._schedule(group_id, expires_at)
+            self.timers.store.save(
+                self._job_id(group_id), str(group_id), minutes, expires_at.timestamp()
+            )
+            timer = self._timer_info(group_id)
+        self._publish('timer_set', dict(timer, group_id=group_id))
+        return timer
+
+    def cancel_timer(self, group_id):
+        with self._lock:
+            cancelled = self._remove_timer(group_id)
+        if cancelled:
+            self._publish('timer_cancelled', {'group_id': group_id})
+        return cancelled
+
+    def _remove_timer(self, group_id):
+        job_id = self._job_id(group_id)
+        self.timers.store.delete(job_id)
+        try:
+            self.timers.scheduler.remove_job(job_id)
+            return True
+        except Exception:
+            return False
+
+    def _timer_info(self, group_id):
+        job = self.timers.scheduler.get_job(self._job_id(group_id))
+        if not job or not job.next_run_time:
+            return None
+        remaining = (job.next_run_time.replace(tzinfo=None) - datetime.now()).total_seconds()
+        return {
+            'expires_at': job.next_run_time.isoformat(),
+            'remaining_seconds': max(0, int(remaining))
+        }
+
+    def _on_timer_expire(self, group_id):
+        """Block everyone in the group, as it stands when the timer fires."""
+        members = sorted(self.members(group_id) or [])
+        print(f"Timer expired for group {group_id}, blocking {len(members)} device(s)...")
+        if members:
+            self.wifi_controller.apply_batch(members, 'block')
+        self.timers.store.delete(self._job_id(group_id))
+        self._publish('timer_expired', {'group_id': group_id, 'macs': members})
@@ -0,0 +1,136 @@
+import os
+import re
+import time
+from datetime import datetime
+from ..utils.process import run_command
+from ..utils.profiling import span
+
+MAC_PATTERN = re.compile(r'^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$')
+NEIGH_PATTERN = re.compile(
+    r'^(\d+\.\d+\.\d+\.\d+)\s.*\blladdr\s+((?:[0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2})\s+(\w+)',
+    re.MULTILINE
+)
+ISC_LEASE_PATTERN = re.compile(r'lease\s+(\d+\.\d+\.\d+\.\d+)\s*\{(.*?)\}', re.DOTALL)
+
+# /proc/net/arp flag for a resolved (complete) entry
+ATF_COM = 0x02
+# `ip neigh` states that mean the device is not actually there
+DEAD_NEIGH_STATES = {'FAILED', 'INCOMPLETE'}
+EMPTY_MAC = '00:00:00:00:00:00'
+
+
+class PassiveDiscovery:
+    """Find devices from state the kernel and DHCP server already keep.
+
+    Nothing is sent on the network: the neighbour table is read from
+    /proc/net/arp, falling back to `ip neigh` only when that file is not
+    available, and hostnames come from the DHCP lease file if one is set.
+    """
+
+    def __init__(self, interface=None, arp_path='/proc/net/arp', leases_file=None):
+        self.interface = interface
+        self.arp_path = arp_path
+        self.leases_file = leases_file
+
+    def read_arp_table(self):
+        """Return {mac: ip} for complete neighbour entries."""
+        if not os.path.exists(self.arp_path):
+            return self._read_ip_neigh()
+
+        entries = {}
+        with span('file.read', self.arp_path), open(self.arp_path, 'r') as f:
+            next(f, None)  # header
+            for line in f:
+                parts = line.split()
+                if len(parts) < 6:
+                    continue
+                ip, _, flags, mac, _, device = parts[:6]
+                if self.interface and device != self.interface:
+                    continue
+                if not int(flags, 16) & ATF_COM or mac == EMPTY_MAC:
+                    continue
+                entries[mac.upper()] = ip
+        return entries
+
+    def _read_ip_neigh(self):
+        """Return {mac: ip} from `ip neigh` for systems without /proc/net/arp."""
+        cmd = ['ip', '-4', 'neigh', 'show']
+        if self.interface:
+            cmd += ['dev', self.interface]
+        result = run_command(cmd, timeout=5)
+        if result.returncode != 0:
+            return {}
+
+        entries = {}
+        for ip, mac, state in NEIGH_PATTERN.findall(result.stdout):
+            if state not in DEAD_NEIGH_STATES:
+                entries[mac.upper()] = ip
+        return entries
+
+    def read_leases(self):
+        """Return {mac: (ip, hostname)} for active DHCP leases.
+
+        Understands both dnsmasq and ISC dhcpd lease files.
+        """
+        if not self.leases_file or not os.path.exists(self.leases_file):
+            return {}
+
+        with span('file.read', self.leases_file), open(self.leases_file, 'r') as f:
+            content = f.read()
+
+        if 'lease ' in content and '{' in content:
+            return self._parse_isc_leases(content)
+        return self._parse_dnsmasq_leases(content)
+
+    def _parse_dnsmasq_leases(self, content):
+        """Parse `<expiry> <mac> <ip> <hostname> <client-id>` lines."""
+        now = time.time()
+        leases = {}
+        for line in content.split('\n'):
+            parts = line.split()
+            if len(parts) < 4 or not MAC_PATTERN.match(parts[1]):
+                continue
+            expiry = int(parts[0]) if parts[0].isdigit() else 0
+            # An expiry of 0 means the lease never expires
+            if expiry and expiry < now:
+                continue
+            hostname = parts[3] if parts[3] != '*' else None
+            leases[parts[1].upper()] = (parts[2], hostname)
+        return leases
+
+    def _parse_isc_leases(self, content):
+        """Parse ISC dhcpd.leases blocks; later blocks win, as in dhcpd."""
+        now = datetime.utcnow()
+        leases = {}
+        for ip, body in ISC_LEASE_PATTERN.findall(content):
+            mac = re.search(r'hardware ethernet\s+([0-9A-Fa-f:]{17})', body)
+            if not mac:
+                continue
+            mac = mac.group(1).upper()
+
+            state = re.search(r'binding state\s+(\w+)', body)
+            ends = re.search(r'ends\s+\d\s+(\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2})', body)
+            expired = ends and datetime.strptime(ends.group(1), '%Y/%m/%d %H:%M:%S') < now
+            if (state and state.group(1) != 'active') or expired:
+                leases.pop(mac, None)
+                continue
+
+            hostname = re.search(r'client-hostname\s+"([^"]*)"', body)
+            leases[mac] = (ip, hostname.group(1) if hostname else None)
+        return leases
+
+    def discover(self):
+        """Merge the neighbour table and DHCP leases into device dicts."""
+        neighbours = self.read_arp_table()
+        leases = self.read_leases()
+
+        devices = []
+        for mac in dict.fromkeys([*neighbours, *leases]):
+            lease_ip, hostname = leases.get(mac, (None, None))
+            devices.append({
+                'mac': mac,
+                'ip': neighbours.get(mac) or lease_ip,
+                'name': hostname or 'Unknown',
+                'vendor': 'Unknown'
+            })
+        return devices
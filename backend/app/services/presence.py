@@ -0,0 +1,160 @@
+import re
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+# rtnetlink constants (linux/rtnetlink.h, linux/neighbour.h)
+NETLINK_ROUTE = 0
+RTMGRP_NEIGH = 0x4
+RTM_NEWNEIGH = 28
+RTM_DELNEIGH = 29
+NDA_DST = 1
+NDA_LLADDR = 2
+NUD_INCOMPLETE = 0x01
+NUD_FAILED = 0x20
+
+NLMSG_HEADER = struct.Struct('=LHHLL')
+NDMSG = struct.Struct('=BxxxiHBB')
+RTATTR = struct.Struct('=HH')
+
+MONITOR_PATTERN = re.compile(
+    r'^(Deleted\s+)?(\d+\.\d+\.\d+\.\d+)\s.*?\blladdr\s+((?:[0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2})(?:.*\s(\w+))?\s*$'
+)
+DEAD_STATES = {'FAILED', 'INCOMPLETE'}
+
+
+class PresenceTracker:
+    """Track which devices are online from kernel neighbour events.
+
+    Subscribes to RTM_NEWNEIGH/RTM_DELNEIGH on a netlink socket, or tails
+    `ip monitor neigh` where netlink sockets are not available, so state
+    only changes when something actually happens on the network.
+    """
+
+    def __init__(self, interface=None, mode='auto', events=None):
+        self.interface = interface
+        self.mode = mode
+        self.events = events
+        self._state = {}
+        # Bumped whenever a device goes online or offline
+        self.version = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.source = None
+
+    def start(self):
+        """Start listening for neighbour events in a background thread."""
+        if self.mode == 'off' or (self._thread and self._thread.is_alive()):
+            return
+
+        target = None
+        if self.mode in ('auto', 'netlink'):
+            try:
+                sock = self._open_netlink()
+                target, self.source = (lambda: self._netlink_loop(sock)), 'netlink'
+            except (OSError, AttributeError):
+                if self.mode == 'netlink':
+                    raise
+        if target is None:
+            target, self.source = self._monitor_loop, 'monitor'
+
+        self._thread = threading.Thread(target=target, name='presence', daemon=True)
+        self._thread.start()
+
+    def _open_netlink(self):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        sock.bind((0, RTMGRP_NEIGH))
+        return sock
+
+    def _netlink_loop(self, sock):
+        ifindex = socket.if_nametoindex(self.interface) if self.interface else None
+        while True:
+            data = sock.recv(65536)
+            for msg_type, neigh_ifindex, state, ip, mac in self._parse_netlink(data):
+                if ifindex and neigh_ifindex != ifindex:
+                    continue
+                online = msg_type == RTM_NEWNEIGH and not state & (NUD_FAILED | NUD_INCOMPLETE)
+                self.update(mac, online, ip)
+
+    def _parse_netlink(self, data):
+        """Yield (type, ifindex, state, ip, mac) for IPv4 neighbour messages."""
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(data):
+            length, msg_type, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+            if length < NLMSG_HEADER.size:
+                break
+            if msg_type in (RTM_NEWNEIGH, RTM_DELNEIGH):
+                body = offset + NLMSG_HEADER.size
+                family, ifindex, state, _, _ = NDMSG.unpack_from(data, body)
+                ip = mac = None
+                attr = body + NDMSG.size
+                while attr + RTATTR.size <= offset + length:
+                    attr_len, attr_type = RTATTR.unpack_from(data, attr)
+                    if attr_len < RTATTR.size:
+                        break
+                    value = data[attr + RTATTR.size:attr + attr_len]
+                    if attr_type == NDA_DST and len(value) == 4:
+                        ip = socket.inet_ntoa(value)
+                    elif attr_type == NDA_LLADDR and len(value) == 6:
+                        mac = ':'.join(f'{b:02X}' for b in value)
+                    attr += (attr_len + 3) & ~3
+                if family == socket.AF_INET and mac:
+                    yield msg_type, ifindex, state, ip, mac
+            offset += (length + 3) & ~3
+
+    def _monitor_loop(self):
+        cmd = ['ip', 'monitor', 'neigh']
+        if self.interface:
+            cmd += ['dev', self.interface]
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+        except FileNotFoundError:
+            self.source = None
+            return
+
+        for line in proc.stdout:
+            match = MONITOR_PATTERN.match(line.strip())
+            if match:
+                deleted, ip, mac, state = match.groups()
+                self.update(mac, not deleted and state not in DEAD_STATES, ip)
+
+    def update(self, mac, online, ip=None):
+        """Record a presence change for a MAC address."""
+        mac = mac.upper()
+        now = time.time()
+        with self._lock:
+            entry = self._state.get(mac)
+            changed = entry is None or entry['online'] != online
+            if changed:
+                self.version += 1
+            if entry is None:
+                entry = self._state[mac] = {'online': online, 'ip': ip, 'last_seen': None}
+            entry['online'] = online
+            if ip:
+                entry['ip'] = ip
+            if online:
+                entry['last_seen'] = now
+
+        if changed and self.events:
+            self.events.publish(
+                'device_online' if online else 'device_offline',
+                {'mac': mac, 'ip': entry['ip']}
+            )
+
+    def seen(self, devices):
+        """Mark devices found by a scan as online."""
+        for device in devices:
+            self.update(device['mac'], True, device.get('ip'))
+
+    def get(self, mac):
+        """Return a copy of the presence entry for a MAC, or None."""
+        with self._lock:
+            entry = self._state.get(mac.upper())
+            return dict(entry) if entry else None
+
+    def is_online(self, mac, default=None):
+        """Return whether a MAC is online, or `default` if never seen."""
+        entry = self._state.get(mac.upper())
+        return entry['online'] if entry else default
@@ -0,0 +1,325 @@
+import bisect
+import json
+import threading
+from datetime import datetime, timedelta
+from apscheduler.triggers.date import DateTrigger
+from ..utils.db import connect
+
+DAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def parse_time(value):
+    """Convert 'HH:MM' to minutes after midnight."""
+    try:
+        hours, minutes = (int(part) for part in value.split(':'))
+    except (AttributeError, ValueError):
+        raise ValueError(f'Invalid time: {value}')
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f'Invalid time: {value}')
+    return hours * 60 + minutes
+
+
+def format_time(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def parse_days(days):
+    """Convert day names ('mon') or numbers (0 = Monday) to sorted numbers."""
+    if not days or not isinstance(days, list):
+        raise ValueError('Days must be a non-empty list')
+    parsed = set()
+    for day in days:
+        if isinstance(day, str) and day[:3].lower() in DAY_NAMES:
+            parsed.add(DAY_NAMES.index(day[:3].lower()))
+        elif isinstance(day, int) and 0 <= day < 7:
+            parsed.add(day)
+        else:
+            raise ValueError(f'Invalid day: {day}')
+    return sorted(parsed)
+
+
+class ScheduleEngine:
+    """Recurring block windows and daily usage quotas.
+
+    Every rule is compiled into one sorted timeline of upcoming window
+    boundaries, and a single scheduler job sleeps until the next one, so
+    wake-ups stay flat however many rules there are. Quotas count time a
+    device spends online and unblocked, and reset at midnight.
+    """
+
+    JOB_ID = 'schedule_engine'
+
+    def __init__(self, wifi_controller, scheduler, db_path, is_online=None,
+                 clock=datetime.now, quota_check_interval=60, group_members=None):
+        self.wifi_controller = wifi_controller
+        self.scheduler = scheduler
+        self.is_online = is_online or (lambda mac: False)
+        # Returns a group's MACs, or None for an unknown group
+        self.group_members = group_members or (lambda group_id: None)
+        self.clock = clock
+        self.quota_check_interval = quota_check_interval
+        self._lock = threading.RLock()
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS schedules ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, macs TEXT NOT NULL, '
+                'days TEXT NOT NULL, start_minute INTEGER NOT NULL, '
+                'end_minute INTEGER NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS quotas ('
+                'mac TEXT PRIMARY KEY, minutes INTEGER NOT NULL, '
+                'used_seconds REAL NOT NULL DEFAULT 0, day TEXT)'
+            )
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(schedules)')}
+            if 'groups' not in columns:
+                self._conn.execute("ALTER TABLE schedules ADD COLUMN groups TEXT NOT NULL DEFAULT '[]'")
+            # MACs the engine itself has blocked, so it only ever lifts
+            # its own blocks and never a manual one
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS schedule_blocks (mac TEXT PRIMARY KEY)'
+            )
+
+        self._rules = {}
+        for rule_id, name, macs, groups, days, start, end in self._conn.execute(
+                'SELECT id, name, macs, groups, days, start_minute, end_minute FROM schedules'):
+            self._rules[rule_id] = {
+                'id': rule_id, 'name': name, 'macs': json.loads(macs),
+                'groups': json.loads(groups), 'days': json.loads(days),
+                'start': start, 'end': end
+            }
+        self._quotas = {
+            mac: {'minutes': minutes, 'used': used, 'day': day}
+            for mac, minutes, used, day in self._conn.execute(
+                'SELECT mac, minutes, used_seconds, day FROM quotas')
+        }
+        self._enforced = {
+            mac for (mac,) in self._conn.execute('SELECT mac FROM schedule_blocks')
+        }
+        self._desired = set()
+        self._timeline = []
+        self._last_tick = None
+
+    # Rules and quotas
+
+    def add_schedule(self, macs, days, start, end, name=None, groups=None):
+        """Add a recurring block window, e.g. 22:00-07:00 on school nights.
+
+        The window can cover devices by MAC and/or whole groups; a group's
+        current members are used each time the window is applied.
+        """
+        macs = macs or []
+        groups = groups or []
+        if not isinstance(macs, list) or not isinstance(groups, list) or not (macs or groups):
+            raise ValueError('A list of MAC addresses or group IDs is required')
+        macs = sorted({self.wifi_controller.validate_mac(mac) for mac in macs})
+        for group_id in groups:
+            if not isinstance(group_id, int) or self.group_members(group_id) is None:
+                raise ValueError(f'Unknown group: {group_id}')
+        groups = sorted(set(groups))
+        days = parse_days(days)
+        start, end = parse_time(start), parse_time(end)
+        if start == end:
+            raise ValueError('Start and end times must differ')
+
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    'INSERT INTO schedules (name, macs, groups, days, start_minute, end_minute) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (name, json.dumps(macs), json.dumps(groups), json.dumps(days), start, end)
+                )
+            rule = {'id': cursor.lastrowid, 'name': name, 'macs': macs, 'groups': groups,
+                    'days': days, 'start': start, 'end': end}
+            self._rules[rule['id']] = rule
+            self._timeline = []
+            self.tick()
+            return self._rule_info(rule, self.clock())
+
+    def remove_schedule(self, rule_id):
+        """Delete a schedule rule. Returns False if it did not exist."""
+        with self._lock:
+            if self._rules.pop(rule_id, None) is None:
+                return False
+            with self._conn:
+                self._conn.execute('DELETE FROM schedules WHERE id = ?', (rule_id,))
+            self._timeline = []
+            self.tick()
+            return True
+
+    def get_schedules(self):
+        now = self.clock()
+        with self._lock:
+            return [self._rule_info(rule, now) for rule in self._rules.values()]
+
+    def set_quota(self, mac, minutes):
+        """Limit a device to `minutes` of online time per day."""
+        mac = self.wifi_controller.validate_mac(mac)
+        if not isinstance(minutes, int) or minutes <= 0:
+            raise ValueError('Minutes must be a positive integer')
+
+        with self._lock:
+            self.tick()
+            quota = self._quotas.setdefault(
+                mac, {'used': 0, 'day': self.clock().date().isoformat()}
+            )
+            quota['minutes'] = minutes
+            self._save_quotas()
+            self.tick()
+            return self._quota_info(mac, quota)
+
+    def remove_quota(self, mac):
+        mac = self.wifi_controller.validate_mac(mac)
+        with self._lock:
+            if self._quotas.pop(mac, None) is None:
+                return False
+            with self._conn:
+                self._conn.execute('DELETE FROM quotas WHERE mac = ?', (mac,))
+            self.tick()
+            return True
+
+    def get_quotas(self):
+        with self._lock:
+            return [self._quota_info(mac, quota) for mac, quota in self._quotas.items()]
+
+    def _rule_info(self, rule, now):
+        return {
+            'id': rule['id'],
+            'name': rule['name'],
+            'macs': rule['macs'],
+            'groups': rule['groups'],
+            'days': [DAY_NAMES[day] for day in rule['days']],
+            'start': format_time(rule['start']),
+            'end': format_time(rule['end']),
+            'active': any(start <= now < end for start, end in self._windows(rule, now))
+        }
+
+    def _quota_info(self, mac, quota):
+        limit = quota['minutes'] * 60
+        return {
+            'mac': mac,
+            'minutes': quota['minutes'],
+            'used_seconds': int(quota['used']),
+            'remaining_seconds': max(0, int(limit - quota['used'])),
+            'exhausted': quota['used'] >= limit
+        }
+
+    def _save_quotas(self):
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO quotas (mac, minutes, used_seconds, day) '
+                'VALUES (?, ?, ?, ?)',
+                [(mac, q['minutes'], q['used'], q['day']) for mac, q in self._quotas.items()]
+            )
+
+    # Timeline
+
+    def _windows(self, rule, around):
+        """Yield (start, end) of a rule's windows from yesterday to next week."""
+        midnight = around.replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in range(-1, 8):
+            day = midnight + timedelta(days=offset)
+            if day.weekday() not in rule['days']:
+                continue
+            start = day + timedelta(minutes=rule['start'])
+            end = day + timedelta(minutes=rule['end'])
+            if end <= start:
+                end += timedelta(days=1)
+            yield start, end
+
+    def _compile(self, now):
+        """Rebuild the sorted timeline of upcoming window boundaries."""
+        boundaries = set()
+        for rule in self._rules.values():
+            for start, end in self._windows(rule, now):
+                boundaries.update(t for t in (start, end) if t > now)
+        self._timeline = sorted(boundaries)
+
+    def _account(self, now):
+        """Charge quota usage since the last tick; reset quotas each day."""
+        elapsed = (now - self._last_tick).total_seconds() if self._last_tick else 0
+        self._last_tick = now
+        if not self._quotas:
+            return
+
+        today = now.date().isoformat()
+        for mac, quota in self._quotas.items():
+            if quota['day'] != today:
+                quota['day'] = today
+                quota['used'] = 0
+            elif elapsed > 0 and self.is_online(mac) and not self.wifi_controller.is_blocked(mac):
+                quota['used'] = min(quota['used'] + elapsed, quota['minutes'] * 60)
+        self._save_quotas()
+
+    def tick(self):
+        """Bring blocks in line with the rules, then sleep until the next change."""
+        with self._lock:
+            now = self.clock()
+            self._account(now)
+
+            desired = {
+                mac for mac, quota in self._quotas.items()
+                if quota['used'] >= quota['minutes'] * 60
+            }
+            for rule in self._rules.values():
+                if any(start <= now < end for start, end in self._windows(rule, now)):
+                    desired.update(rule['macs'])
+                    for group_id in rule['groups']:
+                        desired.update(self.group_members(group_id) or ())
+
+            # Only act on changes, so a manual unblock during a window holds
+            # until the next boundary, and a manual block is never lifted.
+            entering = sorted(
+                mac for mac in desired - self._desired
+                if mac not in self._enforced and not self.wifi_controller.is_blocked(mac)
+            )
+            leaving = sorted((self._desired - desired) & self._enforced)
+            if entering:
+                self.wifi_controller.apply_batch(entering, 'block')
+            if leaving:
+                self.wifi_controller.apply_batch(leaving, 'unblock')
+
+            self._desired = desired
+            self._enforced = (self._enforced - set(leaving)) | set(entering)
+            with self._conn:
+                self._conn.execute('DELETE FROM schedule_blocks')
+                self._conn.executemany(
+                    'INSERT INTO schedule_blocks (mac) VALUES (?)',
+                    [(mac,) for mac in self._enforced]
+                )
+
+            self._schedule_next(now)
+
+    def _next_wakeup(self, now):
+        """Earliest of the next window boundary and any quota deadline."""
+        del self._timeline[:bisect.bisect_right(self._timeline, now)]
+        if not self._timeline:
+            self._compile(now)
+        candidates = self._timeline[:1]
+
+        if self._quotas:
+            midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            candidates.append(midnight + timedelta(days=1))
+            for mac, quota in self._quotas.items():
+                remaining = quota['minutes'] * 60 - quota['used']
+                if remaining > 0 and self.is_online(mac) and not self.wifi_controller.is_blocked(mac):
+                    # Check back when the quota would run out, but often
+                    # enough to notice the device going offline.
+                    wait = min(remaining, self.quota_check_interval)
+                    candidates.append(now + timedelta(seconds=wait))
+
+        return min(candidates) if candidates else None
+
+    def _schedule_next(self, now):
+        wakeup = self._next_wakeup(now)
+        if wakeup is None:
+            if self.scheduler.get_job(self.JOB_ID):
+                self.scheduler.remove_job(self.JOB_ID)
+            return
+        self.scheduler.add_job(
+            func=self.tick,
+            trigger=DateTrigger(run_date=wakeup),
+            id=self.JOB_ID,
+            replace_existing=True
+        )
@@ -0,0 +1,50 @@
+import json
+import os
+import time
+
+
+class StateSnapshot:
+    """The last known devices, blocks and throttles in one JSON file.
+
+    Read once at startup so the API can answer straight away with the
+    state from before the restart, while the live firewall and network are
+    checked in the background. Written atomically, so a crash mid-write
+    leaves the previous snapshot in place.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the saved state, or None if there is no usable snapshot."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return None
+        if not isinstance(state, dict) or state.get('version') != self.VERSION:
+            return None
+        return state
+
+    def save(self, devices, scanned_at, blocked, throttled):
+        """Write the state; `throttled` is {mac: (mark, rate in kbit/s)}."""
+        state = {
+            'version': self.VERSION,
+            'saved_at': time.time(),
+            'scanned_at': scanned_at,
+            'devices': devices,
+            'blocked': sorted(blocked),
+            'throttled': {mac: list(shaped) for mac, shaped in throttled.items()}
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp, self.path)
@@ -1,20 +1,126 @@
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_MODIFIED, EVENT_JOB_REMOVED
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.triggers.date import DateTrigger
 from datetime import datetime, timedelta
 import logging
+from ..config import Config
+from .group_manager import GroupManager
+from .schedule_engine import ScheduleEngine
+from .timer_store import TimerStore
 
 logging.basicConfig()
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
 
 class TimerManager:
-    def __init__(self, wifi_controller):
+    ACTIONS = ('block', 'throttle')
+
+    def __init__(self, wifi_controller, store=None, presence=None, events=None, shaper=None):
         self.wifi_controller = wifi_controller
+        self.shaper = shaper
+        self.events = events
+        self.store = store or TimerStore(Config.DATABASE_PATH)
         self.scheduler = BackgroundScheduler(
             jobstores={'default': MemoryJobStore()}
         )
+        # Bumped whenever a device or group timer is set, fires or is cancelled
+        self.version = 0
+        self.scheduler.add_listener(
+            self._on_job_event, EVENT_JOB_ADDED | EVENT_JOB_MODIFIED | EVENT_JOB_REMOVED
+        )
+        # Timers that ran out while the service was down, for catch_up()
+        self._expired = []
+
+        # Device groups keep one timer job per group on the same scheduler;
+        # schedules that target a group follow its membership
+        self.schedules = None
+        self.groups = GroupManager(
+            wifi_controller, self, Config.DATABASE_PATH, events=events,
+            on_change=lambda: self.schedules and self.schedules.tick()
+        )
+
+        # Recurring windows and quotas share the scheduler as a single job
+        self.schedules = ScheduleEngine(
+            wifi_controller,
+            self.scheduler,
+            Config.DATABASE_PATH,
+            is_online=(lambda mac: presence.is_online(mac, default=False)) if presence else None,
+            quota_check_interval=Config.QUOTA_CHECK_INTERVAL,
+            group_members=self.groups.members
+        )
+
+    def start(self):
+        """Start the scheduler and reschedule the persisted timers.
+
+        Timers are read from the store in one query. Nothing here touches
+        the firewall: timers that ran out while the service was down are
+        kept for catch_up(), which runs once the firewall is in sync.
+        """
         self.scheduler.start()
+        timers = self.store.load()
+        self._expired = self._restore_timers(timers)
+        self.groups.restore_timers(timers)
+
+    def catch_up(self):
+        """Apply timers that expired while stopped, then the schedules.
+
+        Expired block timers are caught up in one batched block instead of
+        firing one by one.
+        """
+        expired, self._expired = self._expired, []
+        blocks = []
+        for timer in expired:
+            if timer['action'] != 'throttle':
+                blocks.append(timer)
+                continue
+            try:
+                self._on_timer_expire(timer['target'], 'throttle', timer['rate_kbit'])
+            except Exception as e:
+                # Kept in the store, so the next start tries again
+                print(f"Could not throttle {timer['target']}: {e}")
+
+        if blocks:
+            macs = [timer['target'] for timer in blocks]
+            print(f"Catching up {len(macs)} timer(s) that expired while stopped...")
+            self.wifi_controller.apply_batch(macs, 'block')
+            self.store.delete(*[timer['job_id'] for timer in blocks])
+            for mac in macs:
+                self._publish('timer_expired', {'mac': mac})
+
+        self.groups.catch_up()
+        self.schedules.tick()
+
+    def _restore_timers(self, timers):
+        """Reschedule persisted device timers; return the ones that expired."""
+        now = datetime.now().timestamp()
+        expired = []
+
+        for timer in timers:
+            # Group timers are restored by the GroupManager
+            if not timer['job_id'].startswith('timer_'):
+                continue
+            if timer['expires_at'] <= now:
+                expired.append(timer)
+                continue
+            self.scheduler.add_job(
+                func=self._on_timer_expire,
+                trigger=DateTrigger(run_date=datetime.fromtimestamp(timer['expires_at'])),
+                args=self._job_args(timer['target'], timer['action'], timer['rate_kbit']),
+                id=timer['job_id'],
+                replace_existing=True
+            )
+        return expired
+
+    def _publish(self, event_type, data):
+        if self.events:
+            self.events.publish(event_type, data)
+
+    def _on_job_event(self, event):
+        # The schedule and reconcile jobs are rescheduled all the time;
+        # only timers count as a change
+        if event.job_id.startswith(('timer_', GroupManager.JOB_PREFIX)):
+            self.version += 1
 
     def _mac_to_job_id(self, mac):
         """Convert MAC address to valid job ID."""
@@ -24,12 +130,27 @@ class TimerManager:
         """Convert job ID back to MAC address."""
         return job_id.replace('timer_', '').replace('_', ':')
 
-    def set_timer(self, mac, minutes):
-        """Set a timer to block a device after specified minutes."""
+    def _job_args(self, mac, action, rate_kbit):
+        return [mac] if action == 'block' else [mac, action, rate_kbit]
+
+    def set_timer(self, mac, minutes, action='block', rate_kbit=None):
+        """Set a timer to block a device after specified minutes.
+
+        With action 'throttle' the device is capped at `rate_kbit` kbit/s
+        instead when the timer runs out.
+        """
         mac = mac.upper().replace('-', ':')
+        if action not in self.ACTIONS:
+            raise ValueError(f'Unknown timer action: {action}')
+        if action == 'throttle':
+            if self.shaper is None:
+                raise ValueError('Throttling is not available')
+            rate_kbit = self.shaper.validate_rate(rate_kbit)
+        else:
+            rate_kbit = None
 
-        # Cancel existing timer if any
-        self.cancel_timer(mac)
+        # Replace existing timer if any
+        self._remove_timer(mac)
 
         expires_at = datetime.now() + timedelta(minutes=minutes)
         job_id = self._mac_to_job_id(mac)
@@ -37,29 +158,55 @@ class TimerManager:
         self.scheduler.add_job(
             func=self._on_timer_expire,
             trigger=DateTrigger(run_date=expires_at),
-            args=[mac],
+            args=self._job_args(mac, action, rate_kbit),
             id=job_id,
             replace_existing=True
         )
+        self.store.save(job_id, mac, minutes, expires_at.timestamp(), action, rate_kbit)
 
-        return {
+        timer = {
             'mac': mac,
             'minutes': minutes,
             'expires_at': expires_at.isoformat(),
-            'remaining_seconds': minutes * 60
+            'remaining_seconds': minutes * 60,
+            'action': action
         }
+        if rate_kbit is not None:
+            timer['rate_kbit'] = rate_kbit
+        self._publish('timer_set', timer)
+        return timer
 
-    def cancel_timer(self, mac):
-        """Cancel a timer for a device."""
-        mac = mac.upper().replace('-', ':')
+    def _remove_timer(self, mac):
+        """Drop a device's timer job and stored row; True if one existed."""
         job_id = self._mac_to_job_id(mac)
 
+        self.store.delete(job_id)
         try:
             self.scheduler.remove_job(job_id)
             return True
         except Exception:
             return False
 
+    def cancel_timer(self, mac):
+        """Cancel a timer for a device."""
+        mac = mac.upper().replace('-', ':')
+
+        cancelled = self._remove_timer(mac)
+        if cancelled:
+            self._publish('timer_cancelled', {'mac': mac})
+        return cancelled
+
+    def cancel_timers(self, macs):
+        """Cancel the timers of several devices with one store write."""
+        macs = [mac.upper().replace('-', ':') for mac in macs]
+        self.store.delete(*[self._mac_to_job_id(mac) for mac in macs])
+        for mac in macs:
+            try:
+                self.scheduler.remove_job(self._mac_to_job_id(mac))
+            except Exception:
+                continue
+            self._publish('timer_cancelled', {'mac': mac})
+
     def get_timer(self, mac):
         """Get active timer info for a device."""
         mac = mac.upper().replace('-', ':')
@@ -67,12 +214,7 @@ class TimerManager:
 
         job = self.scheduler.get_job(job_id)
         if job and job.next_run_time:
-            remaining = (job.next_run_time.replace(tzinfo=None) - datetime.now()).total_seconds()
-            return {
-                'mac': mac,
-                'expires_at': job.next_run_time.isoformat(),
-                'remaining_seconds': max(0, int(remaining))
-            }
+            return self._timer_info(mac, job)
         return None
 
     def get_all_timers(self):
@@ -80,16 +222,38 @@ class TimerManager:
         timers = []
         for job in self.scheduler.get_jobs():
             if job.id.startswith('timer_') and job.next_run_time:
-                mac = self._job_id_to_mac(job.id)
-                remaining = (job.next_run_time.replace(tzinfo=None) - datetime.now()).total_seconds()
-                timers.append({
-                    'mac': mac,
-                    'expires_at': job.next_run_time.isoformat(),
-                    'remaining_seconds': max(0, int(remaining))
-                })
+                timers.append(self._timer_info(self._job_id_to_mac(job.id), job))
         return timers
 
-    def _on_timer_expire(self, mac):
-        """Called when a timer expires - blocks the device."""
-        print(f"Timer expired for {mac}, blocking device...")
-        self.wifi_controller.block_mac(mac)
+    def _timer_info(self, mac, job):
+        remaining = (job.next_run_time.replace(tzinfo=None) - datetime.now()).total_seconds()
+        timer = {
+            'mac': mac,
+            'expires_at': job.next_run_time.isoformat(),
+            'remaining_seconds': max(0, int(remaining)),
+            'action': job.args[1] if len(job.args) > 1 else 'block'
+        }
+        if len(job.args) > 2:
+            timer['rate_kbit'] = job.args[2]
+        return timer
+
+    def count_timers(self):
+        """Return {'device': n, 'group': n} pending timers."""
+        counts = {'device': 0, 'group': 0}
+        for job in self.scheduler.get_jobs():
+            if job.id.startswith('timer_'):
+                counts['device'] += 1
+            elif job.id.startswith(self.groups.JOB_PREFIX):
+                counts['group'] += 1
+        return counts
+
+    def _on_timer_expire(self, mac, action='block', rate_kbit=None):
+        """Called when a timer expires - blocks or throttles the device."""
+        if action == 'throttle':
+            print(f"Timer expired for {mac}, throttling device to {rate_kbit} kbit/s...")
+            self.shaper.throttle(mac, rate_kbit)
+        else:
+            print(f"Timer expired for {mac}, blocking device...")
+            self.wifi_controller.block_mac(mac)
+        self.store.delete(self._mac_to_job_id(mac))
+        self._publish('timer_expired', {'mac': mac, 'action': action})
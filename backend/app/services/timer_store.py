@@ -0,0 +1,55 @@
+import threading
+from ..utils.db import connect
+from ..utils.profiling import span
+
+
+class TimerStore:
+    """Active timers persisted in SQLite so they survive restarts.
+
+    One row per scheduled job; rows are removed when the timer fires or is
+    cancelled.
+    """
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS timers ('
+                'job_id TEXT PRIMARY KEY, target TEXT NOT NULL, '
+                "action TEXT NOT NULL DEFAULT 'block', minutes INTEGER, "
+                'expires_at REAL NOT NULL, rate_kbit INTEGER)'
+            )
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(timers)')}
+            if 'rate_kbit' not in columns:
+                self._conn.execute('ALTER TABLE timers ADD COLUMN rate_kbit INTEGER')
+
+    def save(self, job_id, target, minutes, expires_at, action='block', rate_kbit=None):
+        """Insert or replace a timer; `expires_at` is a Unix timestamp.
+
+        `rate_kbit` is the cap for 'throttle' timers.
+        """
+        with span('db.write', 'timers'), self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO timers '
+                '(job_id, target, action, minutes, expires_at, rate_kbit) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, target, action, minutes, expires_at, rate_kbit)
+            )
+
+    def delete(self, *job_ids):
+        """Remove timers by job ID."""
+        with span('db.write', 'timers'), self._lock, self._conn:
+            self._conn.executemany(
+                'DELETE FROM timers WHERE job_id = ?', [(job_id,) for job_id in job_ids]
+            )
+
+    def load(self):
+        """Return every stored timer as a dict."""
+        rows = self._conn.execute(
+            'SELECT job_id, target, action, minutes, expires_at, rate_kbit FROM timers'
+        ).fetchall()
+        return [
+            {'job_id': job_id, 'target': target, 'action': action,
+             'minutes': minutes, 'expires_at': expires_at, 'rate_kbit': rate_kbit}
+            for job_id, target, action, minutes, expires_at, rate_kbit in rows
+        ]
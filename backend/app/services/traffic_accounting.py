@@ -0,0 +1,227 @@
+import heapq
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from ..config import Config
+from ..utils import metrics
+from ..utils.parsing import parse_accounting_counters, parse_accounting_rules
+from ..utils.process import run_command
+from ..utils.profiling import span
+from .firewall import ensure_chain, iptables
+
+READ_DURATION = metrics.histogram(
+    'armas_accounting_read_seconds', 'Time to sync accounting rules and read their counters.'
+)
+
+# Per-sample values kept for every device, in this order
+FIELDS = ('rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets')
+
+
+def tx_rule_spec(mac):
+    """Rule arguments that count traffic sent by a MAC."""
+    return ['-m', 'mac', '--mac-source', mac, '-m', 'comment', '--comment', f'armas-tx-{mac}']
+
+
+def rx_rule_spec(mac, ip):
+    """Rule arguments that count traffic forwarded to a device's IP."""
+    return ['-d', f'{ip}/32', '-m', 'comment', '--comment', f'armas-rx-{mac}']
+
+
+class TrafficAccounting:
+    """Bytes and packets per device, sampled from firewall rule counters.
+
+    Every known device gets two rules without a target in their own chain:
+    one matching its MAC (upload) and one matching its IP as destination
+    (download; the MAC of a forwarded packet's receiver isn't known yet in
+    FORWARD). Once per interval all counters are read with a single
+    `iptables -L -v -x -n` and the increase since the last read is written
+    into a fixed-size ring per device, so memory stays flat however long
+    the service runs. All devices share the ring's time slots.
+
+    At most `max_devices` are counted; when that is reached, the quietest
+    device that has left the network makes room for a new one.
+    """
+
+    def __init__(self, devices, chain=None, interval=None, samples=None, max_devices=None):
+        self.devices = devices
+        self.chain = chain or Config.ACCOUNTING_CHAIN
+        self.interval = interval or Config.ACCOUNTING_INTERVAL
+        self.size = samples or Config.ACCOUNTING_SAMPLES
+        self.max_devices = max_devices or Config.ACCOUNTING_MAX_DEVICES
+        self._lock = threading.Lock()
+        # {mac: IP its download rule matches, or None}; most recently
+        # active devices last, for eviction
+        self._rules = OrderedDict()
+        # {mac: array of size * len(FIELDS) counters}
+        self._series = {}
+        # {(mac, direction): (packets, bytes)} as last read
+        self._last = {}
+        self._times = array('d', bytes(8 * self.size))
+        self._slot = -1
+        self._count = 0
+
+    def setup(self):
+        """Create the chain and pick up the rules of a previous run."""
+        ensure_chain(self.chain)
+        with self._lock:
+            self._load_rules()
+
+    def _new_series(self):
+        return array('Q', bytes(8 * self.size * len(FIELDS)))
+
+    def _load_rules(self):
+        """Rebuild the rule index from the chain. Lock must be held.
+
+        Devices keep their samples; duplicate download rules are removed.
+        """
+        result = iptables('-S', self.chain)
+        if result.returncode != 0:
+            return False
+        rules = OrderedDict()
+        for mac, direction, ip, rule in parse_accounting_rules(result.stdout):
+            rules.setdefault(mac, None)
+            if direction == 'rx':
+                if rules[mac] is not None:
+                    iptables('-D', self.chain, *rule)
+                else:
+                    rules[mac] = ip
+        self._rules = rules
+        self._series = {mac: self._series.get(mac) or self._new_series() for mac in rules}
+        return True
+
+    def _sync_rules(self):
+        """Add and update rules for the devices on the network. Lock must be held."""
+        wanted = {}
+        for device in self.devices():
+            wanted[device['mac']] = device.get('ip')
+
+        # {mac: specs} for rules to add and delete in this round
+        add, remove = {}, {}
+        for mac, ip in wanted.items():
+            if mac not in self._rules:
+                if len(self._rules) >= self.max_devices and not self._evict(wanted, remove):
+                    # Every counted device is still on the network
+                    continue
+                add[mac] = [tx_rule_spec(mac)]
+                self._rules[mac] = None
+                self._series[mac] = self._new_series()
+                self._last[(mac, 'tx')] = (0, 0)
+            if ip and ip != self._rules[mac]:
+                if self._rules[mac] is not None:
+                    remove.setdefault(mac, []).append(rx_rule_spec(mac, self._rules[mac]))
+                add.setdefault(mac, []).append(rx_rule_spec(mac, ip))
+                self._rules[mac] = ip
+                self._last[(mac, 'rx')] = (0, 0)
+
+        if not add and not remove:
+            return True
+        lines = [' '.join(['-D', self.chain, *spec]) for specs in remove.values() for spec in specs]
+        lines += [' '.join(['-A', self.chain, *spec]) for specs in add.values() for spec in specs]
+        ruleset = '\n'.join(['*filter', *lines, 'COMMIT', ''])
+        if run_command(['sudo', 'iptables-restore', '--noflush'], input=ruleset).returncode != 0:
+            # Start over from what is actually in the chain
+            return self._load_rules()
+        return True
+
+    def _evict(self, wanted, remove):
+        """Drop the quietest device that has left the network. Lock must be held."""
+        for mac, ip in self._rules.items():
+            if mac in wanted:
+                continue
+            del self._rules[mac]
+            del self._series[mac]
+            self._last.pop((mac, 'tx'), None)
+            self._last.pop((mac, 'rx'), None)
+            remove[mac] = [tx_rule_spec(mac)]
+            if ip is not None:
+                remove[mac].append(rx_rule_spec(mac, ip))
+            return True
+        return False
+
+    def sample(self):
+        """Sync the rules, read every counter once and record one sample."""
+        with span('accounting.sample'), READ_DURATION.time(), self._lock:
+            self._sync_rules()
+            result = iptables('-L', self.chain, '-v', '-x', '-n')
+            if result.returncode != 0:
+                return False
+            counters = parse_accounting_counters(result.stdout)
+
+            self._slot = (self._slot + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+            self._times[self._slot] = time.time()
+            base = self._slot * len(FIELDS)
+            for series in self._series.values():
+                for i in range(len(FIELDS)):
+                    series[base + i] = 0
+
+            for key, (packets, nbytes) in counters.items():
+                mac, direction = key
+                series = self._series.get(mac)
+                if series is None:
+                    continue
+                last = self._last.get(key)
+                self._last[key] = (packets, nbytes)
+                if last is None:
+                    # Counted before this process started; no baseline yet
+                    continue
+                # A smaller value means the rule was recreated and started over
+                delta_packets = packets - last[0] if packets >= last[0] else packets
+                delta_bytes = nbytes - last[1] if nbytes >= last[1] else nbytes
+                if direction == 'rx':
+                    series[base] = delta_bytes
+                    series[base + 2] = delta_packets
+                else:
+                    series[base + 1] = delta_bytes
+                    series[base + 3] = delta_packets
+                if delta_bytes:
+                    self._rules.move_to_end(mac)
+            return True
+
+    def _slots(self, window):
+        """Ring slots within the last `window` seconds, oldest first. Lock must be held."""
+        since = time.time() - window if window else 0
+        slots = []
+        for i in range(self._count):
+            slot = (self._slot - i) % self.size
+            if self._times[slot] < since:
+                break
+            slots.append(slot)
+        slots.reverse()
+        return slots
+
+    def get_usage(self, mac, window=None):
+        """Return a device's samples and totals, or None if it isn't counted."""
+        mac = mac.upper().replace('-', ':')
+        with self._lock:
+            series = self._series.get(mac)
+            if series is None:
+                return None
+            samples = []
+            for slot in self._slots(window):
+                base = slot * len(FIELDS)
+                sample = dict(zip(FIELDS, series[base:base + len(FIELDS)]))
+                sample['time'] = self._times[slot]
+                samples.append(sample)
+        return {
+            'mac': mac,
+            'interval': self.interval,
+            'samples': samples,
+            'totals': {field: sum(sample[field] for sample in samples) for field in FIELDS}
+        }
+
+    def get_top(self, window=None, limit=10):
+        """Return the devices that moved the most bytes, biggest first."""
+        with self._lock:
+            slots = self._slots(window)
+            totals = []
+            for mac, series in self._series.items():
+                rx = sum(series[slot * len(FIELDS)] for slot in slots)
+                tx = sum(series[slot * len(FIELDS) + 1] for slot in slots)
+                if rx or tx:
+                    totals.append((rx + tx, mac, rx, tx))
+        return [
+            {'mac': mac, 'rx_bytes': rx, 'tx_bytes': tx, 'total_bytes': total}
+            for total, mac, rx, tx in heapq.nlargest(limit, totals)
+        ]
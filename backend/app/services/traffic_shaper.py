@@ -0,0 +1,249 @@
+import re
+import threading
+from ..config import Config
+from ..utils import metrics
+from ..utils.parsing import parse_shape_rules, parse_tc_classes
+from ..utils.process import run_command
+from ..utils.profiling import span
+
+CHANGES = metrics.counter(
+    'armas_shaping_changes_total', 'Devices throttled, re-rated or unthrottled.', ['action']
+)
+
+# HTB class minors (and the matching connection marks) handed out to devices
+FIRST_CLASS = 0x10
+LAST_CLASS = 0xffff
+
+
+def mangle(*args):
+    """Run an iptables command against the mangle table."""
+    return run_command(['sudo', 'iptables', '-t', 'mangle', *args])
+
+
+def tc(*args, input=None):
+    return run_command(['sudo', 'tc', *args], input=input)
+
+
+def mark_rule_spec(mac, mark):
+    """Rule arguments that mark a MAC's connections for its HTB class."""
+    return ['-m', 'mac', '--mac-source', mac, '-j', 'CONNMARK', '--set-mark', hex(mark)]
+
+
+class TrafficShaper:
+    """Cap devices at a fixed rate instead of cutting them off.
+
+    Each throttled MAC gets a connection mark from a rule in its own mangle
+    chain, and an HTB class of the same number on every shaped interface,
+    selected by a fw filter. Marks are restored onto reply packets, so a
+    class on the LAN interface limits downloads and one on the WAN side
+    limits uploads. The root qdisc is set up once; throttling a device only
+    adds, changes or removes that device's class, filter and rule.
+    """
+
+    def __init__(self, interfaces=None, chain=None, events=None):
+        self.interfaces = interfaces or [
+            iface.strip() for iface in Config.SHAPING_INTERFACES.split(',') if iface.strip()
+        ]
+        self.chain = chain or Config.SHAPING_CHAIN
+        self.events = events
+        self.mac_pattern = re.compile(r'^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$')
+        # {mac: (class minor / mark, rate in kbit/s)}
+        self._shaped = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        # Set once start() has synced with tc and the mangle chain
+        self._ready = threading.Event()
+
+    def start(self):
+        """Set up shaping and load the throttled devices from the system."""
+        try:
+            self.setup()
+            self.reconcile()
+        finally:
+            self._ready.set()
+
+    def restore(self, throttled):
+        """Serve saved {mac: (mark, rate)} until start() has read the real state."""
+        with self._lock:
+            if self._ready.is_set():
+                return
+            self._shaped = {mac: (mark, rate) for mac, (mark, rate) in throttled.items()}
+            self.version += 1
+
+    @property
+    def stale(self):
+        return not self._ready.is_set()
+
+    def export(self):
+        """Return {mac: (mark, rate)} for a snapshot."""
+        return dict(self._shaped)
+
+    def setup(self):
+        """Create the HTB root qdiscs and the mangle chain if missing."""
+        for iface in self.interfaces:
+            result = tc('qdisc', 'show', 'dev', iface)
+            if result.returncode == 0 and 'qdisc htb 1: root' in result.stdout:
+                continue
+            # No default class: unmarked traffic is passed through unshaped
+            tc('qdisc', 'replace', 'dev', iface, 'root', 'handle', '1:', 'htb')
+
+        # -N fails when the chain already exists, which is fine
+        mangle('-N', self.chain)
+        if mangle('-C', 'FORWARD', '-j', self.chain).returncode != 0:
+            mangle('-I', 'FORWARD', '-j', self.chain)
+        restore = ['-j', 'CONNMARK', '--restore-mark']
+        if mangle('-C', 'FORWARD', *restore).returncode != 0:
+            mangle('-A', 'FORWARD', *restore)
+
+    def reconcile(self):
+        """Reload the throttled devices from the mangle chain and tc classes."""
+        with span('shaper.list'), self._lock:
+            return self._reload()
+
+    def _reload(self):
+        """Rebuild the throttled set from the system. Lock must be held."""
+        result = mangle('-S', self.chain)
+        if result.returncode != 0:
+            return False
+        rates = {}
+        if self.interfaces:
+            classes = tc('class', 'show', 'dev', self.interfaces[0])
+            if classes.returncode == 0:
+                rates = parse_tc_classes(classes.stdout)
+        shaped = {
+            mac: (mark, rates.get(mark))
+            for mac, mark, _ in parse_shape_rules(result.stdout)
+        }
+        if shaped != self._shaped:
+            self._shaped = shaped
+            self.version += 1
+        return True
+
+    def _free_mark(self, used):
+        for mark in range(FIRST_CLASS, LAST_CLASS + 1):
+            if mark not in used:
+                return mark
+        raise RuntimeError('No free traffic classes left')
+
+    def plan(self, changes):
+        """Work out the commands for {mac: rate in kbit/s, or None to unthrottle}.
+
+        Returns (tc batch lines that must run first, iptables-restore
+        lines, tc batch lines that must run last, resulting state). A new
+        device's class exists before its traffic is marked, and its mark
+        is gone before the class is deleted. Classes and filters are
+        replaced rather than added, so retrying after a half-applied
+        change is safe.
+        """
+        shaped = dict(self._shaped)
+        used = {mark for mark, _ in shaped.values()}
+        before, rules, after = [], [], []
+
+        for mac, rate in sorted(changes.items()):
+            current = shaped.get(mac)
+            if rate is None:
+                if current is None:
+                    continue
+                mark = current[0]
+                rules.append(' '.join(['-D', self.chain, *mark_rule_spec(mac, mark)]))
+                for iface in self.interfaces:
+                    after.append(
+                        f'filter del dev {iface} parent 1: protocol all prio 1 handle {hex(mark)} fw'
+                    )
+                    after.append(f'class del dev {iface} classid 1:{mark:x}')
+                del shaped[mac]
+                used.discard(mark)
+            elif current is None:
+                mark = self._free_mark(used)
+                used.add(mark)
+                for iface in self.interfaces:
+                    before.append(
+                        f'class replace dev {iface} parent 1: classid 1:{mark:x} '
+                        f'htb rate {rate}kbit ceil {rate}kbit'
+                    )
+                    before.append(
+                        f'filter replace dev {iface} parent 1: protocol all prio 1 '
+                        f'handle {hex(mark)} fw classid 1:{mark:x}'
+                    )
+                rules.append(' '.join(['-A', self.chain, *mark_rule_spec(mac, mark)]))
+                shaped[mac] = (mark, rate)
+            elif current[1] != rate:
+                mark = current[0]
+                for iface in self.interfaces:
+                    before.append(
+                        f'class replace dev {iface} parent 1: classid 1:{mark:x} '
+                        f'htb rate {rate}kbit ceil {rate}kbit'
+                    )
+                shaped[mac] = (mark, rate)
+
+        return before, rules, after, shaped
+
+    def _apply(self, changes):
+        """Apply a change set and return the MACs whose state changed."""
+        self._ready.wait()
+        with self._lock:
+            before, rules, after, shaped = self.plan(changes)
+            if before and tc('-batch', '-', input='\n'.join(before) + '\n').returncode != 0:
+                self._reload()
+                raise RuntimeError('Failed to update traffic classes')
+            if rules:
+                ruleset = '\n'.join(['*mangle', *rules, 'COMMIT', ''])
+                result = run_command(['sudo', 'iptables-restore', '--noflush'], input=ruleset)
+                if result.returncode != 0:
+                    self._reload()
+                    raise RuntimeError('Failed to update traffic marks')
+            # Leftover classes only cost memory, so a failure here is not fatal
+            if after:
+                tc('-force', '-batch', '-', input='\n'.join(after) + '\n')
+
+            changed = {
+                mac for mac in changes if self._shaped.get(mac) != shaped.get(mac)
+            }
+            previous, self._shaped = self._shaped, shaped
+            if changed:
+                self.version += 1
+
+        for mac in sorted(changed):
+            if mac in shaped:
+                CHANGES.inc(action='rerate' if mac in previous else 'throttle')
+                self._publish('throttled', {'mac': mac, 'rate_kbit': shaped[mac][1]})
+            else:
+                CHANGES.inc(action='unthrottle')
+                self._publish('unthrottled', {'mac': mac})
+        return changed
+
+    def _publish(self, event_type, data):
+        if self.events:
+            self.events.publish(event_type, data)
+
+    def validate_mac(self, mac):
+        mac = mac.upper().replace('-', ':')
+        if not self.mac_pattern.match(mac):
+            raise ValueError(f'Invalid MAC address: {mac}')
+        return mac
+
+    def validate_rate(self, rate_kbit):
+        if isinstance(rate_kbit, bool) or not isinstance(rate_kbit, (int, float)) or rate_kbit < 1:
+            raise ValueError('Rate must be a positive number of kbit/s')
+        return int(rate_kbit)
+
+    def throttle(self, mac, rate_kbit):
+        """Cap a device at `rate_kbit` kbit/s, or change its existing cap."""
+        mac = self.validate_mac(mac)
+        rate_kbit = self.validate_rate(rate_kbit)
+        self._apply({mac: rate_kbit})
+        return {'mac': mac, 'rate_kbit': rate_kbit}
+
+    def unthrottle(self, mac):
+        """Lift a device's cap. Returns False if it wasn't throttled."""
+        mac = self.validate_mac(mac)
+        return bool(self._apply({mac: None}))
+
+    def get_rate(self, mac):
+        """Return a device's cap in kbit/s, or None if it isn't throttled."""
+        shaped = self._shaped.get(mac.upper().replace('-', ':'))
+        return shaped[1] if shaped else None
+
+    def get_throttled(self):
+        """Return {mac: rate in kbit/s} for every throttled device."""
+        return {mac: rate for mac, (_, rate) in sorted(self._shaped.items())}
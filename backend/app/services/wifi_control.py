@@ -1,10 +1,63 @@
-import subprocess
 import re
+import threading
+from ..config import Config
+from ..utils import metrics
+from ..utils.profiling import span
+from .firewall import create_backend
+from .firewall_queue import FirewallQueue
+
+APPLY_DURATION = metrics.histogram(
+    'armas_firewall_apply_seconds', 'Time to apply one firewall transaction.'
+)
+BATCH_SIZE = metrics.histogram(
+    'armas_firewall_batch_size', 'Rule changes per firewall transaction.',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000)
+)
+TRANSACTIONS = metrics.counter(
+    'armas_firewall_transactions_total', 'Firewall transactions by outcome.', ['result']
+)
+MUTATIONS = metrics.counter(
+    'armas_firewall_mutations_total', 'Devices blocked or unblocked in the firewall.', ['action']
+)
 
 
 class WifiController:
-    def __init__(self):
+    def __init__(self, backend=None, events=None):
         self.mac_pattern = re.compile(r'^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$')
+        self.backend = backend or create_backend(
+            Config.FIREWALL_BACKEND, Config.FIREWALL_CHAIN, Config.FIREWALL_SET
+        )
+        self.events = events
+        self._blocked = set()
+        # Bumped whenever the blocked set changes, for cheap change checks
+        self.version = 0
+        self._lock = threading.Lock()
+        # Set once start() has synced with the live firewall; until then
+        # the blocked set may come from a snapshot and writes wait
+        self._ready = threading.Event()
+        self.queue = FirewallQueue(self._flush, window=Config.FIREWALL_COALESCE_MS / 1000)
+
+    def start(self):
+        """Create the firewall chain and load the blocked set from it."""
+        try:
+            self.backend.setup()
+            self.reconcile()
+        finally:
+            # Never leave writes waiting, even if the firewall is unreachable
+            self._ready.set()
+
+    def restore(self, blocked):
+        """Serve a saved blocked set until start() has read the real one."""
+        with self._lock:
+            if self._ready.is_set():
+                return
+            self._blocked = set(blocked)
+            self.version += 1
+
+    @property
+    def stale(self):
+        """True while the blocked set has not been checked against the firewall."""
+        return not self._ready.is_set()
 
     def validate_mac(self, mac):
         """Validate and normalize MAC address format."""
@@ -13,57 +66,131 @@ class WifiController:
             raise ValueError(f'Invalid MAC address: {mac}')
         return mac
 
-    def block_mac(self, mac):
-        """Block a MAC address using iptables."""
-        mac = self.validate_mac(mac)
+    def _reload(self):
+        """Rebuild the blocked set from the firewall. Lock must be held."""
+        blocked = self.backend.list_blocked()
+        if blocked is None:
+            return False
+        previous, self._blocked = self._blocked, blocked
+        if blocked != previous:
+            self.version += 1
+        self._publish(sorted(blocked - previous), True)
+        self._publish(sorted(previous - blocked), False)
+        return True
+
+    def _publish(self, macs, blocked):
+        if self.events:
+            for mac in macs:
+                self.events.publish('blocked' if blocked else 'unblocked', {'mac': mac})
+
+    def reconcile(self):
+        """Reload the blocked set from the live firewall.
+
+        Picks up blocks that were added or removed outside the controller.
+        """
+        with span('firewall.list'), self._lock:
+            return self._reload()
+
+    def _flush(self, wanted):
+        """Apply {mac: block} as one backend transaction.
 
-        # Check if already blocked
-        if self.is_blocked(mac):
-            return True
+        Runs on the firewall writer thread. Returns a result dict per MAC
+        with its final state and whether it changed.
+        """
+        self._ready.wait()
+        with self._lock:
+            ok, add, remove = self._flush_locked(wanted)
+            if not ok and self._reload():
+                # The firewall may have been edited behind our back;
+                # resync and try once more with an up to date delta.
+                ok, add, remove = self._flush_locked(wanted)
 
-        cmd = [
-            'sudo', 'iptables', '-I', 'FORWARD',
-            '-m', 'mac', '--mac-source', mac,
-            '-j', 'DROP'
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return result.returncode == 0
+        changed = set(add) | set(remove)
+        results = {}
+        for mac, block in wanted.items():
+            result = {
+                'mac': mac,
+                'blocked': block if ok else mac in self._blocked,
+                'changed': ok and mac in changed
+            }
+            if not ok and mac in changed:
+                result['error'] = 'Firewall update failed'
+            results[mac] = result
+        return results
+
+    def _flush_locked(self, wanted):
+        """Apply the delta for {mac: block}. Lock must be held.
+
+        Returns (ok, added, removed).
+        """
+        add = sorted(mac for mac, block in wanted.items() if block and mac not in self._blocked)
+        remove = sorted(mac for mac, block in wanted.items() if not block and mac in self._blocked)
+        if not add and not remove:
+            return True, add, remove
+
+        with APPLY_DURATION.time():
+            ok = self.backend.apply(add, remove)
+        BATCH_SIZE.observe(len(add) + len(remove))
+        TRANSACTIONS.inc(result='ok' if ok else 'failed')
+        if ok:
+            MUTATIONS.inc(len(add), action='block')
+            MUTATIONS.inc(len(remove), action='unblock')
+            self._blocked.update(add)
+            self._blocked.difference_update(remove)
+            self.version += 1
+            self._publish(add, True)
+            self._publish(remove, False)
+        return ok, add, remove
+
+    def submit(self, mac, action):
+        """Queue a block or unblock and return a Future for its result."""
+        if action not in ('block', 'unblock'):
+            raise ValueError(f'Invalid action: {action}')
+        return self.queue.submit(self.validate_mac(mac), action == 'block')
+
+    def block_mac(self, mac):
+        """Block a MAC address in the firewall."""
+        future = self.submit(mac, 'block')
+        with span('firewall.wait', mac):
+            return 'error' not in future.result()
 
     def unblock_mac(self, mac):
-        """Remove iptables block for a MAC address."""
-        mac = self.validate_mac(mac)
+        """Remove the firewall block for a MAC address."""
+        future = self.submit(mac, 'unblock')
+        with span('firewall.wait', mac):
+            return 'error' not in future.result()
+
+    def apply_batch(self, macs, action):
+        """Block or unblock many MAC addresses in one firewall transaction.
+
+        Returns one result dict per requested MAC, in request order. Invalid
+        MACs get an error entry and do not stop the rest of the batch.
+        """
+        if action not in ('block', 'unblock'):
+            raise ValueError(f'Invalid action: {action}')
 
-        # Remove all matching rules (in case of duplicates)
-        while self.is_blocked(mac):
-            cmd = [
-                'sudo', 'iptables', '-D', 'FORWARD',
-                '-m', 'mac', '--mac-source', mac,
-                '-j', 'DROP'
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                break
+        # Queue everything before waiting so it all lands in one flush
+        futures = []
+        for mac in macs:
+            try:
+                futures.append(self.submit(mac, action))
+            except (ValueError, AttributeError):
+                futures.append(None)
 
-        return not self.is_blocked(mac)
+        results = []
+        with span('firewall.wait', f'{len(macs)} device(s)'):
+            for raw, future in zip(macs, futures):
+                if future is None:
+                    results.append({'mac': raw, 'error': f'Invalid MAC address: {raw}'})
+                else:
+                    results.append(future.result())
+        return results
 
     def is_blocked(self, mac):
         """Check if a MAC address is currently blocked."""
         mac = self.validate_mac(mac)
-        cmd = ['sudo', 'iptables', '-L', 'FORWARD', '-n']
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return mac.upper() in result.stdout.upper()
+        return mac in self._blocked
 
     def get_blocked_macs(self):
         """Get list of all blocked MAC addresses."""
-        cmd = ['sudo', 'iptables', '-L', 'FORWARD', '-n']
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        blocked = []
-        for line in result.stdout.split('\n'):
-            # Look for MAC addresses in DROP rules
-            if 'DROP' in line and 'MAC' in line:
-                match = re.search(r'([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}', line)
-                if match:
-                    blocked.append(match.group(0).upper())
-
-        return list(set(blocked))  # Remove duplicates
+        return sorted(self._blocked)
@@ -0,0 +1,15 @@
+import os
+import sqlite3
+
+
+def connect(path):
+    """Open a SQLite database in WAL mode, shareable across threads.
+
+    Callers are expected to serialise writes themselves; WAL lets readers
+    carry on while a write is in progress and keeps commits crash-safe.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
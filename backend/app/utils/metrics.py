@@ -0,0 +1,212 @@
+"""Counters, histograms and gauges rendered in Prometheus text format.
+
+Recording never takes a lock: every thread writes to its own shard of each
+metric, and shards are only summed when /api/metrics is scraped. Shards of
+threads that have exited are folded into a running total at that point so
+short-lived request threads don't accumulate.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers a quick iptables call up to a slow full-range sweep
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Sharded:
+    """Per-thread storage for one metric, merged on collection."""
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+        return values
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def _collect(self):
+        """Return {label values: merged value} across all shards."""
+        with self._lock:
+            live = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    self._merge(self._retired, values)
+            self._shards = live
+            merged = {}
+            self._merge(merged, self._retired)
+            for _, values in live:
+                self._merge(merged, dict(values))
+        return merged
+
+
+class Counter(_Sharded):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        values = self._shard()
+        key = self._key(labels)
+        values[key] = values.get(key, 0) + amount
+
+    def _merge(self, into, values):
+        for key, value in values.items():
+            into[key] = into.get(key, 0) + value
+
+    def render(self):
+        return [
+            f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+            for key, value in sorted(self._collect().items())
+        ]
+
+
+class Histogram(_Sharded):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        values = self._shard()
+        key = self._key(labels)
+        counts = values.get(key)
+        if counts is None:
+            # One slot per bucket, then +Inf, sum and count
+            counts = values[key] = [0] * (len(self.buckets) + 3)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(self.buckets)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the body of a `with` block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _merge(self, into, values):
+        for key, counts in values.items():
+            total = into.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(list(counts)):
+                total[i] += count
+
+    def render(self):
+        lines = []
+        for key, counts in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                le = (('le', _format_value(bound)),)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(counts[-2])}')
+            lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time.
+
+    The callback returns a number, or {label values tuple: number}.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help, callback, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.callback = callback
+
+    def render(self):
+        value = self.callback()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f'{self.name}{_format_labels(self.labels, key)} {_format_value(v)}'
+            for key, v in sorted(value.items()) if v is not None
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, Gauge):
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, callback, labels=()):
+        """Register (or replace) a gauge read from `callback` when scraped."""
+        return self._register(Gauge(name, help, callback, labels))
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.render()
+            except Exception:
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines += samples
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+gauge = REGISTRY.gauge
+render = REGISTRY.render
@@ -0,0 +1,151 @@
+"""Offline vendor lookup from the IEEE MAC address registries.
+
+`build()` compiles the IEEE MA-L, MA-M and MA-S CSV exports into one sorted
+binary file, and `OuiDatabase` memory-maps that file and binary-searches it,
+so a lookup reads a handful of pages and nothing is parsed at startup.
+
+File layout (big-endian):
+
+    header   b'OUI1', then the record counts for 36, 28 and 24-bit prefixes
+    records  one section per prefix length, most specific first, each
+             sorted by prefix: (prefix: u64, name offset: u32)
+    names    NUL-terminated UTF-8 vendor names, each stored once
+
+Regenerate it with
+
+    python -m app.utils.oui oui.csv mam.csv oui36.csv -o data/oui.bin
+"""
+import argparse
+import bisect
+import csv
+import mmap
+import os
+import struct
+
+MAGIC = b'OUI1'
+HEADER = struct.Struct('>4sIII')
+RECORD = struct.Struct('>QI')
+# MA-S, MA-M and MA-L assignments, searched in this order
+PREFIX_BITS = (36, 28, 24)
+
+
+class _Prefixes:
+    """Sequence view of one section's sorted prefixes, for bisect."""
+
+    def __init__(self, buffer, offset, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return RECORD.unpack_from(self.buffer, self.offset + i * RECORD.size)[0]
+
+
+class OuiDatabase:
+    """Memory-mapped vendor index built by `build()`.
+
+    A missing or unreadable file just means every lookup returns None.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self._sections = []
+        if path and os.path.exists(path):
+            self._open(path)
+
+    def _open(self, path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                return
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *counts = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            buffer.close()
+            return
+
+        offset = HEADER.size
+        for bits, count in zip(PREFIX_BITS, counts):
+            self._sections.append((bits, _Prefixes(buffer, offset, count)))
+            offset += count * RECORD.size
+        self._names = offset
+        self._map = buffer
+
+    def __len__(self):
+        return sum(len(prefixes) for _, prefixes in self._sections)
+
+    def lookup(self, mac):
+        """Return the registered vendor for a MAC address, or None."""
+        if self._map is None:
+            return None
+        try:
+            value = int(mac.replace(':', '').replace('-', ''), 16)
+        except (AttributeError, ValueError):
+            return None
+
+        for bits, prefixes in self._sections:
+            prefix = value >> (48 - bits)
+            i = bisect.bisect_left(prefixes, prefix)
+            if i < len(prefixes) and prefixes[i] == prefix:
+                _, name = RECORD.unpack_from(self._map, prefixes.offset + i * RECORD.size)
+                start = self._names + name
+                return self._map[start:self._map.find(b'\0', start)].decode('utf-8')
+        return None
+
+
+def read_registry(path):
+    """Yield (bits, prefix, vendor) rows from an IEEE registry CSV export."""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            assignment = (row.get('Assignment') or '').strip()
+            vendor = (row.get('Organization Name') or '').strip()
+            bits = len(assignment) * 4
+            if bits not in PREFIX_BITS or not vendor:
+                continue
+            try:
+                yield bits, int(assignment, 16), vendor
+            except ValueError:
+                continue
+
+
+def build(csv_paths, output):
+    """Compile IEEE registry CSVs into the binary index. Returns the record count."""
+    sections = {bits: {} for bits in PREFIX_BITS}
+    for path in csv_paths:
+        for bits, prefix, vendor in read_registry(path):
+            sections[bits][prefix] = vendor
+
+    names = bytearray()
+    offsets = {}
+    records = []
+    for bits in PREFIX_BITS:
+        for prefix, vendor in sorted(sections[bits].items()):
+            if vendor not in offsets:
+                offsets[vendor] = len(names)
+                names += vendor.encode('utf-8') + b'\0'
+            records.append(RECORD.pack(prefix, offsets[vendor]))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tmp = output + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, *(len(sections[bits]) for bits in PREFIX_BITS)))
+        f.writelines(records)
+        f.write(names)
+    os.replace(tmp, output)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the OUI vendor index.')
+    parser.add_argument('csv', nargs='+', help='IEEE oui.csv, mam.csv and/or oui36.csv')
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args()
+    count = build(args.csv, args.output)
+    print(f'Wrote {count} prefixes to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Single-pass parsers for arp-scan, arp, iptables and tc output.
+
+Each parser runs one compiled pattern over the whole buffer instead of
+splitting lines and searching each one several times. MACs are
+de-duplicated as packed 48-bit integers, so case and formatting never
+matter, and upper-cased once for the result.
+"""
+import re
+import shlex
+
+_MAC = r'(?:[0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}'
+_IP = r'\d{1,3}(?:\.\d{1,3}){3}'
+
+# "<ip>\t<mac>\t<vendor>" result lines; the header and footer never match
+ARP_SCAN_PATTERN = re.compile(
+    rf'^(?P<ip>{_IP})\t(?P<mac>{_MAC})(?:\t(?P<vendor>[^\n]*))?$', re.MULTILINE
+)
+# "? (<ip>) at <mac> [ether] on eth0"
+ARP_TABLE_PATTERN = re.compile(rf'\((?P<ip>{_IP})\) at (?P<mac>{_MAC})')
+# "-A <chain> ... --mac-source <mac> ... -j DROP" from `iptables -S`
+BLOCK_RULE_PATTERN = re.compile(
+    rf'^-A \S+ (?P<rule>[^\n]*?--mac-source (?P<mac>{_MAC})[^\n]*?-j DROP\b[^\n]*)$',
+    re.MULTILINE
+)
+# "-A <chain> -m mac --mac-source <mac> -j CONNMARK --set-xmark 0x10/0xffffffff"
+SHAPE_RULE_PATTERN = re.compile(
+    rf'^-A \S+ (?P<rule>[^\n]*?--mac-source (?P<mac>{_MAC})[^\n]*?'
+    r'-j CONNMARK --set-x?mark (?P<mark>0x[0-9a-fA-F]+|\d+)[^\n]*)$',
+    re.MULTILINE
+)
+# "class htb 1:10 root prio 0 rate 512Kbit ceil 512Kbit ..." from `tc class show`
+TC_CLASS_PATTERN = re.compile(
+    r'^class htb \w+:(?P<minor>[0-9a-fA-F]+) [^\n]*?rate (?P<rate>\d+(?:\.\d+)?)(?P<unit>[KMG]?)bit',
+    re.MULTILINE
+)
+_RATE_UNITS = {'': 0.001, 'K': 1, 'M': 1000, 'G': 1000000}
+# Accounting rules, tagged with an "armas-<rx|tx>-<mac>" comment; from
+# `iptables -S` and, with their counters, from `iptables -L -v -x -n`
+ACCT_RULE_PATTERN = re.compile(
+    rf'^-A \S+ (?P<rule>(?:-d (?P<ip>{_IP})(?:/32)? )?[^\n]*?'
+    rf'--comment "?armas-(?P<direction>rx|tx)-(?P<mac>{_MAC})"?[^\n]*)$',
+    re.MULTILINE
+)
+ACCT_COUNTER_PATTERN = re.compile(
+    rf'^\s*(?P<packets>\d+)\s+(?P<bytes>\d+)\s[^\n]*?armas-(?P<direction>rx|tx)-(?P<mac>{_MAC})',
+    re.MULTILINE
+)
+
+
+def mac_to_int(mac):
+    """Pack a colon-separated MAC into a 48-bit integer."""
+    return int(mac.replace(':', ''), 16)
+
+
+def int_to_mac(value):
+    """Format a 48-bit integer as an upper-case colon-separated MAC."""
+    digits = f'{value:012X}'
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def parse_arp_scan(output):
+    """Return unique devices from arp-scan output, first sighting wins."""
+    devices = []
+    seen = set()
+    for ip, mac, vendor in ARP_SCAN_PATTERN.findall(output):
+        # Extra replies arp-scan flags as duplicates
+        if '(DUP:' in vendor:
+            continue
+        key = mac_to_int(mac)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        vendor = vendor.strip() or 'Unknown'
+        devices.append({
+            'mac': mac.upper(),
+            'ip': ip,
+            'name': vendor if vendor != '(Unknown)' else 'Unknown',
+            'vendor': vendor
+        })
+    return devices
+
+
+def parse_arp_table(output):
+    """Return unique devices from `arp -a` output."""
+    devices = []
+    seen = set()
+    for ip, mac in ARP_TABLE_PATTERN.findall(output):
+        key = mac_to_int(mac)
+        if key in seen:
+            continue
+        seen.add(key)
+        devices.append({
+            'mac': mac.upper(),
+            'ip': ip,
+            'name': 'Unknown',
+            'vendor': 'Unknown'
+        })
+    return devices
+
+
+def parse_block_rules(output):
+    """Yield (mac, rule args) for each MAC DROP rule in `iptables -S` output."""
+    for rule, mac in BLOCK_RULE_PATTERN.findall(output):
+        # Only rules with quoted comments need a real shell-style split
+        yield mac.upper(), shlex.split(rule) if '"' in rule else rule.split()
+
+
+def parse_shape_rules(output):
+    """Yield (mac, mark, rule args) for each CONNMARK rule in `iptables -S` output."""
+    for rule, mac, mark in SHAPE_RULE_PATTERN.findall(output):
+        yield mac.upper(), int(mark, 0), rule.split()
+
+
+def parse_tc_classes(output):
+    """Return {class minor: rate in kbit/s} from `tc class show` output."""
+    return {
+        int(minor, 16): round(float(rate) * _RATE_UNITS[unit])
+        for minor, rate, unit in TC_CLASS_PATTERN.findall(output)
+    }
+
+
+def parse_accounting_rules(output):
+    """Yield (mac, direction, ip, rule args) for each accounting rule in `iptables -S` output."""
+    for rule, ip, direction, mac in ACCT_RULE_PATTERN.findall(output):
+        yield mac.upper(), direction, ip or None, rule.split()
+
+
+def parse_accounting_counters(output):
+    """Return {(mac, direction): (packets, bytes)} from `iptables -L -v -x -n` output."""
+    return {
+        (mac.upper(), direction): (int(packets), int(nbytes))
+        for packets, nbytes, direction, mac in ACCT_COUNTER_PATTERN.findall(output)
+    }
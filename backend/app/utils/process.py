@@ -0,0 +1,129 @@
+import asyncio
+import contextvars
+import os
+import subprocess
+import threading
+import time
+from . import metrics
+from .profiling import span
+
+_runner = None
+# Per-request tally of commands run, set up by count_commands()
+_command_count = contextvars.ContextVar('command_count', default=None)
+
+COMMAND_DURATION = metrics.histogram(
+    'armas_command_duration_seconds', 'Time spent in external commands.', ['command']
+)
+COMMAND_TIMEOUTS = metrics.counter(
+    'armas_command_timeouts_total', 'External commands killed after timing out.', ['command']
+)
+COMMAND_FAILURES = metrics.counter(
+    'armas_command_failures_total', 'External commands that exited non-zero.', ['command']
+)
+
+
+class AsyncRunner:
+    """Run commands with asyncio subprocesses on a private event loop.
+
+    A semaphore caps how many commands run at once, so a burst of requests
+    can't fork an unbounded number of arp-scan or iptables processes.
+    """
+
+    def __init__(self, concurrency):
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        threading.Thread(
+            target=self._loop.run_forever, name='async-subprocess', daemon=True
+        ).start()
+
+    async def run(self, cmd, input=None, timeout=None):
+        """Run a command and return a CompletedProcess, like subprocess.run."""
+        async with self._semaphore:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+            except FileNotFoundError as e:
+                return subprocess.CompletedProcess(cmd, 127, '', str(e))
+
+            data = input.encode() if input is not None else None
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(data), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+            return subprocess.CompletedProcess(
+                cmd, proc.returncode, stdout.decode(), stderr.decode()
+            )
+
+    def run_sync(self, cmd, input=None, timeout=None):
+        """Run a command on the loop and wait for it from a worker thread."""
+        future = asyncio.run_coroutine_threadsafe(self.run(cmd, input, timeout), self._loop)
+        return future.result()
+
+
+def use_async(concurrency):
+    """Route every run_command call through a shared AsyncRunner."""
+    global _runner
+    if _runner is None:
+        _runner = AsyncRunner(concurrency)
+    return _runner
+
+
+def count_commands():
+    """Start counting commands run in the current context.
+
+    Returns a one-item list holding the running count. Commands queued to
+    another thread (like the firewall writer) count there, not here.
+    """
+    counter = [0]
+    _command_count.set(counter)
+    return counter
+
+
+def command_name(cmd):
+    """Metric label for a command: the program run, looking past sudo."""
+    program = cmd[1] if cmd[0] == 'sudo' and len(cmd) > 1 else cmd[0]
+    return os.path.basename(program)
+
+
+def run_command(cmd, input=None, timeout=None):
+    """Run a command and return the completed process.
+
+    A missing binary is reported as a failed result (exit code 127) instead
+    of raising, so callers only need to check the return code. A timeout
+    raises subprocess.TimeoutExpired.
+    """
+    name = command_name(cmd)
+    counter = _command_count.get()
+    if counter is not None:
+        counter[0] += 1
+    start = time.perf_counter()
+    try:
+        with span('command', name):
+            result = _run(cmd, input, timeout)
+    except subprocess.TimeoutExpired:
+        COMMAND_TIMEOUTS.inc(command=name)
+        raise
+    finally:
+        COMMAND_DURATION.observe(time.perf_counter() - start, command=name)
+    if result.returncode != 0:
+        COMMAND_FAILURES.inc(command=name)
+    return result
+
+
+def _run(cmd, input, timeout):
+    if _runner is not None:
+        return _runner.run_sync(cmd, input, timeout)
+
+    try:
+        return subprocess.run(
+            cmd, input=input, capture_output=True, text=True, timeout=timeout
+        )
+    except FileNotFoundError as e:
+        return subprocess.CompletedProcess(cmd, 127, '', str(e))
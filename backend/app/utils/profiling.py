@@ -0,0 +1,164 @@
+"""Opt-in request profiling: named spans, a slow-request log and cProfile.
+
+Service code wraps interesting steps in `with span('scan.arp-scan'):`.
+Outside a profiled request `span()` is a context variable lookup that
+returns a shared no-op object, so the instrumentation can stay in hot
+paths permanently. `install(app)` turns it on for every request.
+"""
+import cProfile
+import contextvars
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from flask import g, request
+
+_spans = contextvars.ContextVar('spans', default=None)
+# cProfile can only profile one request at a time
+_profiler_lock = threading.Lock()
+
+slow_log = logging.getLogger('armas.slow_requests')
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Trace:
+    """Spans recorded for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'detail', 'start', 'depth')
+
+    def __init__(self, trace, name, detail):
+        self.trace = trace
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self):
+        self.depth = self.trace.depth
+        self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.trace.depth -= 1
+        entry = {
+            'name': self.name,
+            'start_ms': round((self.start - self.trace.started) * 1000, 2),
+            'duration_ms': round((end - self.start) * 1000, 2),
+            'depth': self.depth
+        }
+        if self.detail is not None:
+            entry['detail'] = self.detail
+        self.trace.spans.append(entry)
+        return False
+
+
+def span(name, detail=None):
+    """Time a block as part of the current request's trace, if any."""
+    trace = _spans.get()
+    if trace is None:
+        return NULL_SPAN
+    return _Span(trace, name, detail)
+
+
+def install(app, slow_ms=500, log_path=None, profile_allowed=None):
+    """Trace every request handled by `app`.
+
+    Requests slower than `slow_ms` are logged as one JSON line to the
+    'armas.slow_requests' logger (and `log_path` if given). A request with
+    ?profile=1 that passes `profile_allowed(request)` also runs under
+    cProfile, and the spans and top functions are added to its JSON body.
+    """
+    if log_path:
+        handler = logging.FileHandler(log_path)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_log.addHandler(handler)
+        slow_log.propagate = False
+    slow_log.setLevel(logging.INFO)
+
+    @app.before_request
+    def start_trace():
+        g.trace = _Trace()
+        _spans.set(g.trace)
+        g.profiler = None
+        if request.args.get('profile') == '1' and profile_allowed and profile_allowed(request):
+            if _profiler_lock.acquire(blocking=False):
+                g.profiler = cProfile.Profile()
+                g.profiler.enable()
+
+    @app.after_request
+    def finish_trace(response):
+        trace = getattr(g, 'trace', None)
+        if trace is None:
+            return response
+        duration_ms = round((time.perf_counter() - trace.started) * 1000, 2)
+        _spans.set(None)
+
+        # Spans are recorded as they end; report them in start order
+        trace.spans.sort(key=lambda s: s['start_ms'])
+        top = [s for s in trace.spans if s['depth'] == 0]
+        response.headers['Server-Timing'] = ', '.join(
+            [f'{s["name"]};dur={s["duration_ms"]}' for s in top] + [f'total;dur={duration_ms}']
+        )
+
+        if duration_ms >= slow_ms:
+            slow_log.info(json.dumps({
+                'time': time.time(),
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': duration_ms,
+                'spans': trace.spans
+            }))
+
+        if g.profiler is not None:
+            profiler, g.profiler = g.profiler, None
+            profiler.disable()
+            _profiler_lock.release()
+            _attach_profile(response, profiler, trace, duration_ms)
+        return response
+
+    @app.teardown_request
+    def end_trace(exc):
+        # after_request is skipped when a view raises
+        _spans.set(None)
+        profiler = getattr(g, 'profiler', None)
+        if profiler is not None:
+            g.profiler = None
+            profiler.disable()
+            _profiler_lock.release()
+
+
+def _attach_profile(response, profiler, trace, duration_ms):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(30)
+
+    body = response.get_json(silent=True)
+    if not isinstance(body, dict):
+        return
+    body['profile'] = {
+        'duration_ms': duration_ms,
+        'spans': trace.spans,
+        'stats': out.getvalue()
+    }
+    response.set_data(json.dumps(body))
@@ -0,0 +1,10 @@
+from uvicorn.middleware.wsgi import WSGIMiddleware
+from app.config import Config
+from app.utils.process import use_async
+
+# Switch subprocess calls to asyncio before the services start running them
+use_async(Config.SUBPROCESS_CONCURRENCY)
+
+from app import create_app  # noqa: E402
+
+app = WSGIMiddleware(create_app(), workers=Config.ASGI_WORKERS)
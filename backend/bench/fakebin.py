@@ -0,0 +1,266 @@
+"""Deterministic stand-ins for the system binaries the backend shells out to.
+
+install() writes small Python scripts named sudo, arp-scan, arp, iptables,
+iptables-restore, ipset and tc into a directory that is then put first on
+PATH. Their behaviour is read from fake.json next to them on every call,
+so a benchmark can change scan latency or host counts while the server is
+running; seed_rules() preloads the fake firewall with existing rules.
+"""
+import json
+import os
+import stat
+import sys
+
+DEFAULTS = {
+    'scan_delay': 0.0,      # seconds each arp-scan takes
+    'command_delay': 0.0,   # seconds every other fake command takes
+    'hosts': 20,            # hosts on the fake network (10.0.0.1 onwards)
+    'failing_shards': [],   # arp-scan targets (CIDR strings) that fail
+}
+
+# NETWORK_RANGE that covers every fake host
+NETWORK = '10.0.0.0/8'
+
+PRELUDE = '''#!{python}
+import ipaddress, json, os, sys, time
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONFIG = json.load(open(os.path.join(HERE, 'fake.json')))
+STATE = os.path.join(HERE, 'state.json')
+
+def load_state():
+    try:
+        with open(STATE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {{'FORWARD': []}}
+
+def save_state(state):
+    tmp = STATE + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE)
+
+def host(i):
+    return '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255), \\
+        'aa:bb:cc:%02x:%02x:%02x' % (i >> 16 & 255, i >> 8 & 255, i & 255)
+'''
+
+SCRIPTS = {
+    'sudo': '''
+os.execvp(sys.argv[1], sys.argv[1:])
+''',
+    'arp-scan': '''
+time.sleep(CONFIG['scan_delay'])
+target = ipaddress.ip_network(sys.argv[-1], strict=False)
+if str(target) in CONFIG.get('failing_shards', []):
+    sys.stderr.write('arp-scan: pcap_activate: No such device\\n')
+    sys.exit(1)
+# Only the hosts inside the requested shard answer
+found = [i for i in range(1, CONFIG['hosts'] + 1)
+         if ipaddress.ip_address(host(i)[0]) in target]
+print('Interface: eth0, type: EN10MB, MAC: 00:11:22:33:44:55, IPv4: 10.0.0.254')
+print('Starting arp-scan 1.9.7 with %d hosts' % target.num_addresses)
+for i in found:
+    ip, mac = host(i)
+    print('%s\\t%s\\tVendor %d' % (ip, mac, i % 50))
+print()
+print('%d packets received by filter, 0 packets dropped by kernel' % len(found))
+''',
+    'arp': '''
+time.sleep(CONFIG['command_delay'])
+for i in range(1, min(CONFIG['hosts'], 50) + 1):
+    ip, mac = host(i)
+    print('? (%s) at %s [ether] on eth0' % (ip, mac))
+''',
+    'iptables': '''
+time.sleep(CONFIG['command_delay'])
+args = sys.argv[1:]
+if args[:1] == ['-t']:
+    args = args[2:]
+op, chain, rule = args[0], args[1] if len(args) > 1 else None, ' '.join(args[2:])
+state = load_state()
+code = 0
+if op == '-N':
+    code = 1 if chain in state else 0
+    state.setdefault(chain, [])
+elif op == '-C':
+    code = 0 if rule in state.get(chain, []) else 1
+elif op in ('-I', '-A'):
+    rules = state.setdefault(chain, [])
+    rules.insert(0, rule) if op == '-I' else rules.append(rule)
+elif op == '-D':
+    if rule in state.get(chain, []):
+        state[chain].remove(rule)
+    else:
+        code = 1
+elif op == '-S':
+    if chain not in state:
+        code = 1
+    else:
+        print('-N ' + chain)
+        for r in state[chain]:
+            print('-A %s %s' % (chain, r))
+elif op == '-L':
+    # Counters grow with every read: rule n has seen n packets of 1000 bytes per read
+    reads = state['reads'] = state.get('reads', 0) + 1
+    print('Chain %s (1 references)' % chain)
+    print('    pkts      bytes target     prot opt in     out     source               destination')
+    for n, r in enumerate(state.get(chain, []), 1):
+        print('%8d %8d DROP       all  --  *      *       0.0.0.0/0            0.0.0.0/0            %s'
+              % (n * reads, n * reads * 1000, r))
+if op in ('-N', '-I', '-A', '-D', '-L'):
+    save_state(state)
+sys.exit(code)
+''',
+    'iptables-restore': '''
+time.sleep(CONFIG['command_delay'])
+state = load_state()
+for line in sys.stdin.read().splitlines():
+    parts = line.split()
+    if not parts or parts[0].startswith(('*', ':', '#')) or parts[0] == 'COMMIT':
+        continue
+    op, chain, rule = parts[0], parts[1], ' '.join(parts[2:])
+    rules = state.setdefault(chain, [])
+    if op == '-A':
+        rules.append(rule)
+    elif op == '-I':
+        rules.insert(0, rule)
+    elif op == '-D':
+        if rule not in rules:
+            sys.stderr.write('iptables-restore: line failed\\n')
+            sys.exit(1)
+        rules.remove(rule)
+save_state(state)
+''',
+    'ipset': '''
+time.sleep(CONFIG['command_delay'])
+args = sys.argv[1:]
+state = load_state()
+sets = state.setdefault('ipsets', {})
+if args[0] == 'create':
+    sets.setdefault(args[1], [])
+elif args[0] == 'save':
+    if args[1] not in sets:
+        sys.exit(1)
+    print('create %s hash:mac' % args[1])
+    for mac in sets[args[1]]:
+        print('add %s %s' % (args[1], mac))
+elif args[0] == 'restore':
+    for line in sys.stdin.read().splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[0] == 'add' and parts[2] not in sets[parts[1]]:
+            sets[parts[1]].append(parts[2])
+        elif len(parts) == 3 and parts[0] == 'del' and parts[2] in sets[parts[1]]:
+            sets[parts[1]].remove(parts[2])
+save_state(state)
+''',
+    'tc': '''
+time.sleep(CONFIG['command_delay'])
+args = sys.argv[1:]
+force = args[:1] == ['-force']
+if force:
+    args = args[1:]
+state = load_state()
+devices = state.setdefault('tc', {})
+
+def fmt(kbit):
+    return '%dMbit' % (kbit // 1000) if kbit >= 1000 and kbit % 1000 == 0 else '%dKbit' % kbit
+
+def run(words):
+    kind, op, dev = words[0], words[1], words[3]
+    if kind == 'qdisc':
+        if op == 'show':
+            if devices.get(dev, {}).get('qdisc') == 'htb':
+                print('qdisc htb 1: root refcnt 2 r2q 10 default 0 direct_packets_stat 0')
+            else:
+                print('qdisc noqueue 0: root refcnt 2')
+        elif op == 'replace':
+            devices[dev] = {'qdisc': words[words.index('root') + 3], 'classes': {}, 'filters': {}}
+        return True
+    tree = devices.get(dev)
+    if tree is None or tree['qdisc'] != 'htb':
+        return False
+    if kind == 'class':
+        if op == 'show':
+            for minor, kbit in sorted(tree['classes'].items()):
+                print('class htb 1:%s root prio 0 rate %s ceil %s burst 1600b cburst 1600b'
+                      % (minor, fmt(kbit), fmt(kbit)))
+            return True
+        minor = words[words.index('classid') + 1].split(':')[1]
+        if op in ('add', 'replace', 'change'):
+            if (op == 'add' and minor in tree['classes']) or (op == 'change' and minor not in tree['classes']):
+                return False
+            tree['classes'][minor] = int(words[words.index('rate') + 1][:-4])
+        elif op == 'del':
+            if minor not in tree['classes'] or minor in tree['filters'].values():
+                return False
+            del tree['classes'][minor]
+        return True
+    if kind == 'filter':
+        handle = '%x' % int(words[words.index('handle') + 1], 0)
+        if op in ('add', 'replace'):
+            tree['filters'][handle] = words[words.index('classid') + 1].split(':')[1]
+        elif op == 'del':
+            return tree['filters'].pop(handle, None) is not None
+        return True
+    return False
+
+if args[:2] == ['-batch', '-']:
+    ok = True
+    for number, line in enumerate(sys.stdin.read().splitlines(), 1):
+        if line.strip() and not run(line.split()):
+            sys.stderr.write('Command failed -:%d\\n' % number)
+            ok = False
+            if not force:
+                break
+    code = 0 if ok else 1
+else:
+    code = 0 if run(args) else 1
+save_state(state)
+sys.exit(code)
+''',
+}
+
+
+def configure(directory, **options):
+    """Update fake.json; running fakes pick the change up on their next call."""
+    path = os.path.join(directory, 'fake.json')
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        with open(path) as f:
+            config.update(json.load(f))
+    config.update(options)
+    with open(path, 'w') as f:
+        json.dump(config, f)
+
+
+def seed_rules(directory, count, chain='ARMAS_BLOCK'):
+    """Start the fake firewall with `count` MAC DROP rules already in `chain`."""
+    rules = [
+        '-m mac --mac-source %s -j DROP' % ':'.join(
+            '%02X' % b for b in (0x02, 0xEE, i >> 24 & 255, i >> 16 & 255, i >> 8 & 255, i & 255))
+        for i in range(count)
+    ]
+    with open(os.path.join(directory, 'state.json'), 'w') as f:
+        json.dump({'FORWARD': ['-j ' + chain], chain: rules}, f)
+
+
+def install(directory, **options):
+    """Write the fake binaries into `directory` and return it."""
+    os.makedirs(directory, exist_ok=True)
+    prelude = PRELUDE.format(python=sys.executable)
+    for name, body in SCRIPTS.items():
+        path = os.path.join(directory, name)
+        with open(path, 'w') as f:
+            f.write(prelude + body)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    configure(directory, **options)
+    return directory
+
+
+def environ(directory, **extra):
+    """Environment for a server process that should use the fakes."""
+    env = dict(os.environ)
+    env['PATH'] = directory + os.pathsep + env.get('PATH', '')
+    env.update({key: str(value) for key, value in extra.items()})
+    return env
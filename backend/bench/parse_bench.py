@@ -0,0 +1,112 @@
+"""Compare the shared parsers with the old per-line ones on a large network.
+
+Generates synthetic arp-scan and `iptables -S` output for a /16 (65k hosts,
+with a sprinkling of duplicate replies) and times both implementations.
+
+    python bench/parse_bench.py --hosts 65536 --repeat 5
+"""
+import argparse
+import os
+import re
+import shlex
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.parsing import parse_arp_scan, parse_block_rules  # noqa: E402
+
+
+def synthetic_arp_scan(hosts):
+    lines = ['Interface: eth0, type: EN10MB, MAC: 02:00:00:00:00:01, IPv4: 10.0.0.1',
+             'Starting arp-scan 1.10.0 with 65536 hosts']
+    for i in range(hosts):
+        ip = f'10.0.{i >> 8 & 0xFF}.{i & 0xFF}'
+        mac = ':'.join(f'{b:02x}' for b in (0x02, 0, 0, i >> 16 & 0xFF, i >> 8 & 0xFF, i & 0xFF))
+        lines.append(f'{ip}\t{mac}\tVendor {i % 97}')
+        if i % 50 == 0:
+            lines.append(f'{ip}\t{mac}\tVendor {i % 97} (DUP: 2)')
+    lines.append(f'\n{hosts} packets received by filter, 0 packets dropped by kernel')
+    return '\n'.join(lines) + '\n'
+
+
+def synthetic_rules(hosts):
+    lines = ['-N ARMAS_BLOCK']
+    for i in range(hosts):
+        mac = ':'.join(f'{b:02X}' for b in (0x02, 0, 0, i >> 16 & 0xFF, i >> 8 & 0xFF, i & 0xFF))
+        lines.append(f'-A ARMAS_BLOCK -m mac --mac-source {mac} -j DROP')
+    return '\n'.join(lines) + '\n'
+
+
+def legacy_arp_scan(output):
+    """The previous DeviceScanner parser plus its separate dedup pass."""
+    devices = []
+    seen_macs = set()
+    mac_pattern = re.compile(r'([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}')
+    ip_pattern = re.compile(r'\d+\.\d+\.\d+\.\d+')
+    for line in output.split('\n'):
+        if 'DUP:' in line:
+            continue
+        mac_match = mac_pattern.search(line)
+        ip_match = ip_pattern.search(line)
+        if mac_match and ip_match:
+            mac = mac_match.group(0).upper()
+            if mac in seen_macs:
+                continue
+            seen_macs.add(mac)
+            parts = line.split('\t')
+            vendor = parts[2].strip() if len(parts) > 2 else 'Unknown'
+            devices.append({'mac': mac, 'ip': ip_match.group(0),
+                            'name': vendor if vendor != '(Unknown)' else 'Unknown',
+                            'vendor': vendor})
+
+    seen_macs = set()
+    unique = []
+    for device in devices:
+        if device['mac'].upper() not in seen_macs:
+            seen_macs.add(device['mac'].upper())
+            unique.append(device)
+    return unique
+
+
+def legacy_block_rules(output):
+    """The previous firewall rule parser."""
+    pattern = re.compile(r'--mac-source\s+((?:[0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2})')
+    for line in output.split('\n'):
+        if not line.startswith('-A ') or '-j DROP' not in line:
+            continue
+        match = pattern.search(line)
+        if match:
+            yield match.group(1).upper(), shlex.split(line)[2:]
+
+
+def best_of(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = list(func(data))
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--hosts', type=int, default=65536)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ('arp-scan', synthetic_arp_scan(args.hosts), legacy_arp_scan, parse_arp_scan),
+        ('iptables -S', synthetic_rules(args.hosts), legacy_block_rules, parse_block_rules),
+    ]
+    for name, data, old, new in cases:
+        old_time, old_count = best_of(old, data, args.repeat)
+        new_time, new_count = best_of(new, data, args.repeat)
+        print(f'{name:12} {len(data) / 1e6:6.1f} MB  '
+              f'legacy {old_time * 1000:8.1f} ms ({old_count})  '
+              f'shared {new_time * 1000:8.1f} ms ({new_count})  '
+              f'{old_time / new_time:4.1f}x')
+
+
+if __name__ == '__main__':
+    main()
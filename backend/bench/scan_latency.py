@@ -0,0 +1,113 @@
+"""Check that cheap endpoints stay fast while a slow arp-scan is running.
+
+Starts the API against fake system binaries, warms the device cache, then
+forces a long /api/scan and hammers /api/health and /api/devices while it
+runs, reporting latency percentiles for each.
+
+    python bench/scan_latency.py --mode asgi --scan-seconds 30
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import fakebin
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_KEY = 'bench-key'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def get(port, path, timeout=120):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    start = time.perf_counter()
+    conn.request('GET', path, headers={'X-API-Key': API_KEY})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status, time.perf_counter() - start
+
+
+def wait_until_up(port, deadline=30):
+    end = time.time() + deadline
+    while time.time() < end:
+        try:
+            get(port, '/api/health', timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--mode', choices=['asgi', 'wsgi'], default='asgi')
+    parser.add_argument('--scan-seconds', type=float, default=30)
+    parser.add_argument('--hosts', type=int, default=200)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='armas-bench-')
+    bindir = fakebin.install(os.path.join(workdir, 'bin'), hosts=args.hosts)
+    env = fakebin.environ(
+        bindir,
+        SERVER_MODE=args.mode,
+        HOST='127.0.0.1',
+        PORT=args.port,
+        API_KEY=API_KEY,
+        DATA_DIR=os.path.join(workdir, 'data'),
+        NETWORK_RANGE=fakebin.NETWORK,
+        SCAN_SHARD_PREFIX=8,
+        DISCOVERY_MODE='active',
+        PRESENCE_MODE='off',
+        SCAN_INTERVAL=3600,
+        ARP_TABLE_PATH=os.path.join(workdir, 'no-arp-table')
+    )
+    server = subprocess.Popen(
+        [sys.executable, 'run.py'], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        wait_until_up(args.port)
+        get(args.port, '/api/devices')  # warm the cache with a fast scan
+
+        fakebin.configure(bindir, scan_delay=args.scan_seconds)
+        scan = threading.Thread(target=get, args=(args.port, '/api/scan'))
+        scan.start()
+        time.sleep(0.5)
+
+        latencies = {'/api/health': [], '/api/devices': []}
+        end = time.time() + args.scan_seconds * 0.8
+        while time.time() < end and scan.is_alive():
+            for path, samples in latencies.items():
+                status, elapsed = get(args.port, path)
+                if status == 200:
+                    samples.append(elapsed)
+        scan.join()
+
+        print(f'{args.mode} mode, {args.scan_seconds:.0f}s scan in progress')
+        print(f"{'endpoint':<16}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for path, samples in latencies.items():
+            if not samples:
+                print(f'{path:<16}{0:>10}')
+                continue
+            print(f'{path:<16}{len(samples):>10}'
+                  f'{percentile(samples, 50) * 1000:>10.1f}'
+                  f'{percentile(samples, 99) * 1000:>10.1f}'
+                  f'{max(samples) * 1000:>10.1f}')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""Reproducible benchmarks for the API and its services, on fake binaries.
+
+Puts the fakes from fakebin.py first on PATH (with the given latency, host
+count and pre-existing firewall rules), then drives the Flask app end to
+end through its test client and times a few service hot spots directly.
+Results can be saved as a JSON baseline and later runs compared against
+it, failing when anything got slower than the tolerance allows.
+
+    python bench/suite.py --save bench/baseline.json
+    python bench/suite.py --compare bench/baseline.json --tolerance 0.25
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import fakebin  # noqa: E402
+from scan_latency import percentile  # noqa: E402
+
+API_KEY = 'bench-key'
+HEADERS = {'X-API-Key': API_KEY}
+
+
+def summarise(samples, elapsed):
+    return {
+        'count': len(samples),
+        'per_second': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3)
+    }
+
+
+def measure(func, iterations, warmup=3):
+    """Call `func` repeatedly and return its latency summary."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarise(samples, time.perf_counter() - started)
+
+
+def prepare(args):
+    """Install the fakes and point the app's config at them.
+
+    Must run before the app package is imported, since Config reads the
+    environment at import time.
+    """
+    workdir = tempfile.mkdtemp(prefix='armas-bench-')
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    bindir = fakebin.install(
+        os.path.join(workdir, 'bin'),
+        hosts=args.hosts,
+        command_delay=args.command_delay,
+        scan_delay=args.command_delay
+    )
+    fakebin.seed_rules(bindir, args.rules)
+    os.environ.update(fakebin.environ(
+        bindir,
+        API_KEY=API_KEY,
+        DATA_DIR=os.path.join(workdir, 'data'),
+        NETWORK_RANGE=fakebin.NETWORK,
+        SCAN_SHARD_PREFIX=8,
+        DISCOVERY_MODE='active',
+        PRESENCE_MODE='off',
+        SCAN_INTERVAL=3600,
+        RECONCILE_INTERVAL=3600,
+        ARP_TABLE_PATH=os.path.join(workdir, 'no-arp-table'),
+        FIREWALL_COALESCE_MS=args.coalesce_ms
+    ))
+
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f'{response.request.path} returned {response.status_code}')
+    return response
+
+
+def bench_endpoints(client, args):
+    mac = 'AA:BB:CC:00:00:01'
+    cursor = check(client.get('/api/devices', headers=HEADERS)).get_json()['data']['cursor']
+    etag = check(client.get('/api/dashboard', headers=HEADERS)).headers['ETag']
+    unchanged = dict(HEADERS, **{'If-None-Match': etag})
+    state = {'blocked': False}
+
+    def toggle_block():
+        action = 'unblock' if state['blocked'] else 'block'
+        check(client.post(f'/api/control/{action}', headers=HEADERS, json={'mac': mac}))
+        state['blocked'] = not state['blocked']
+
+    cases = {
+        'GET /api/health': (lambda: check(client.get('/api/health')), args.requests),
+        'GET /api/devices': (
+            lambda: check(client.get('/api/devices', headers=HEADERS)), args.requests),
+        'GET /api/devices?since': (
+            lambda: check(client.get(f'/api/devices?since={cursor}', headers=HEADERS)), args.requests),
+        'GET /api/devices/<mac>': (
+            lambda: check(client.get(f'/api/devices/{mac}', headers=HEADERS)), args.requests),
+        'GET /api/control/blocked': (
+            lambda: check(client.get('/api/control/blocked', headers=HEADERS)), args.requests),
+        'GET /api/timers': (
+            lambda: check(client.get('/api/timers', headers=HEADERS)), args.requests),
+        'GET /api/dashboard': (
+            lambda: check(client.get('/api/dashboard', headers=HEADERS)), args.requests),
+        'GET /api/dashboard (304)': (
+            lambda: client.get('/api/dashboard', headers=unchanged), args.requests),
+        'GET /api/metrics': (
+            lambda: check(client.get('/api/metrics', headers=HEADERS)), args.requests),
+        'POST /api/control/block|unblock': (toggle_block, max(10, args.requests // 10)),
+    }
+    return {name: measure(func, iterations) for name, (func, iterations) in cases.items()}
+
+
+def bench_services(args):
+    # parse_bench imports the app package, so only after prepare()
+    from parse_bench import synthetic_arp_scan
+    from app.services import timer_manager, wifi_controller
+    from app.utils.parsing import parse_arp_scan
+
+    results = {}
+
+    output = synthetic_arp_scan(args.parse_hosts)
+    results[f'parse.arp-scan ({args.parse_hosts} hosts)'] = measure(
+        lambda: parse_arp_scan(output), 20
+    )
+
+    results[f'firewall.reconcile ({args.rules} rules)'] = measure(wifi_controller.reconcile, 20)
+
+    macs = iter(f'02:DD:00:00:{i >> 8 & 255:02X}:{i & 255:02X}' for i in range(1 << 16))
+    results[f'firewall.block ({args.rules} rules)'] = measure(
+        lambda: wifi_controller.block_mac(next(macs)), max(10, args.requests // 10)
+    )
+
+    timer_macs = [f'02:CC:00:00:{i >> 8 & 255:02X}:{i & 255:02X}' for i in range(args.timers)]
+    for timer_mac in timer_macs:
+        timer_manager.set_timer(timer_mac, 60)
+    results[f'timers.list ({args.timers} jobs)'] = measure(timer_manager.get_all_timers, 20)
+    timer_manager.cancel_timers(timer_macs)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print current vs baseline p50; return the names that regressed."""
+    regressed = []
+    print(f"\n{'benchmark':<40}{'base p50':>12}{'now p50':>12}{'ratio':>8}")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f'{name:<40}{"-":>12}{current["p50_ms"]:>12.3f}{"new":>8}')
+            continue
+        ratio = current['p50_ms'] / base['p50_ms'] if base['p50_ms'] else 1.0
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressed.append(name)
+            flag = '  SLOWER'
+        print(f'{name:<40}{base["p50_ms"]:>12.3f}{current["p50_ms"]:>12.3f}{ratio:>8.2f}{flag}')
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--hosts', type=int, default=250, help='hosts the fake arp-scan finds')
+    parser.add_argument('--rules', type=int, default=1000, help='existing firewall rules')
+    parser.add_argument('--timers', type=int, default=1000, help='timers for the listing benchmark')
+    parser.add_argument('--parse-hosts', type=int, default=65536)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--command-delay', type=float, default=0.0,
+                        help='extra seconds every fake command takes')
+    parser.add_argument('--coalesce-ms', type=int, default=0,
+                        help='FIREWALL_COALESCE_MS for the run')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against this JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p50 slowdown before a benchmark counts as regressed')
+    args = parser.parse_args()
+
+    prepare(args)
+    from app import create_app
+
+    from app import services
+
+    client = create_app().test_client()
+    # Measure the steady state, not requests racing the startup reconcile
+    services.reconciled.wait()
+    results = bench_endpoints(client, args)
+    results.update(bench_services(args))
+
+    print(f"{'benchmark':<40}{'count':>8}{'per sec':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<40}{result['count']:>8}{result['per_second']:>10}"
+              f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'hosts': args.hosts,
+            'rules': args.rules,
+            'timers': args.timers,
+            'command_delay': args.command_delay,
+            'coalesce_ms': args.coalesce_ms
+        },
+        'results': results,
+        'startup': {phase: round(seconds, 4) for phase, seconds in services.startup_timings.items()}
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'\nSaved results to {args.save}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressed = compare(results, baseline['results'], args.tolerance)
+        if regressed:
+            print(f'\n{len(regressed)} benchmark(s) slower than the baseline allows')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
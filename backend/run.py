@@ -1,5 +1,10 @@
 from app import create_app
 from app.config import Config
+from app.utils.process import use_async
+
+if Config.SERVER_MODE == 'asgi':
+    # Run arp-scan/iptables as asyncio subprocesses before any service starts
+    use_async(Config.SUBPROCESS_CONCURRENCY)
 
 app = create_app()
 
@@ -7,8 +12,18 @@ if __name__ == '__main__':
     print(f"Starting Armas WiFi Control API on {Config.HOST}:{Config.PORT}")
     print(f"Network range: {Config.NETWORK_RANGE}")
     print(f"Interface: {Config.NETWORK_INTERFACE}")
-    app.run(
-        host=Config.HOST,
-        port=Config.PORT,
-        debug=Config.DEBUG
-    )
+
+    if Config.SERVER_MODE == 'asgi':
+        import uvicorn
+        from uvicorn.middleware.wsgi import WSGIMiddleware
+        uvicorn.run(
+            WSGIMiddleware(app, workers=Config.ASGI_WORKERS),
+            host=Config.HOST,
+            port=Config.PORT
+        )
+    else:
+        app.run(
+            host=Config.HOST,
+            port=Config.PORT,
+            debug=Config.DEBUG
+        )
@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'bench'))
+
+# Config is read when the app package is first imported, and importing any
+# service builds the shared instances; keep their state out of ./data and
+# leave the host's network alone.
+os.environ.update({
+    'DATA_DIR': tempfile.mkdtemp(prefix='armas-tests-'),
+    'PRESENCE_MODE': 'off',
+    'DISCOVERY_MODE': 'passive',
+})
+
+import fakebin  # noqa: E402
+
+# Importing any service builds the shared instances, which already talk to
+# the firewall; keep them away from the host's rules.
+os.environ['PATH'] = (
+    fakebin.install(tempfile.mkdtemp(prefix='armas-tests-')) + os.pathsep + os.environ['PATH']
+)
+
+
+class FakeSystem:
+    """The fake iptables, ipset and arp-scan from bench/fakebin.py on PATH."""
+
+    def __init__(self, bindir):
+        self.bindir = bindir
+
+    def state(self):
+        try:
+            with open(os.path.join(self.bindir, 'state.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'FORWARD': []}
+
+    def set_state(self, state):
+        with open(os.path.join(self.bindir, 'state.json'), 'w') as f:
+            json.dump(state, f)
+
+    def configure(self, **options):
+        fakebin.configure(self.bindir, **options)
+
+
+@pytest.fixture
+def fake_system(tmp_path, monkeypatch):
+    bindir = fakebin.install(str(tmp_path / 'bin'))
+    monkeypatch.setenv('PATH', bindir + os.pathsep + os.environ.get('PATH', ''))
+    return FakeSystem(bindir)
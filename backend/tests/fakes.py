@@ -0,0 +1,44 @@
+"""Small in-memory stand-ins for services, shared by the tests."""
+
+
+class FakeController:
+    """WifiController with a plain set for a firewall."""
+
+    def __init__(self):
+        self.blocked = set()
+        self.calls = []
+
+    def validate_mac(self, mac):
+        return mac.upper().replace('-', ':')
+
+    def is_blocked(self, mac):
+        return mac in self.blocked
+
+    def block_mac(self, mac):
+        self.apply_batch([mac], 'block')
+        return True
+
+    def unblock_mac(self, mac):
+        self.apply_batch([mac], 'unblock')
+        return True
+
+    def apply_batch(self, macs, action):
+        self.calls.append((action, list(macs)))
+        if action == 'block':
+            self.blocked.update(macs)
+        else:
+            self.blocked.difference_update(macs)
+        return [{'mac': mac, 'blocked': action == 'block'} for mac in macs]
+
+
+class FakeShaper:
+    def __init__(self):
+        self.throttled = {}
+
+    def validate_rate(self, rate_kbit):
+        if not isinstance(rate_kbit, int) or rate_kbit < 1:
+            raise ValueError('Rate must be a positive number of kbit/s')
+        return rate_kbit
+
+    def throttle(self, mac, rate_kbit):
+        self.throttled[mac] = rate_kbit
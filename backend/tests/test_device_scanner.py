@@ -0,0 +1,66 @@
+import ipaddress
+import os
+
+from app.services.device_scanner import DeviceScanner, shard_targets
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def make_scanner(mode):
+    scanner = DeviceScanner()
+    scanner.discovery_mode = mode
+    scanner.active_scan_interval = 3600
+    return scanner
+
+
+def sharded_scanner(network='10.0.0.0/27', prefix=28):
+    scanner = make_scanner('active')
+    scanner.shards = shard_targets([('eth0', ipaddress.ip_network(network))], prefix)
+    scanner.scan_workers = len(scanner.shards)
+    scanner.shard_timeout = 10
+    scanner.passive.interface = 'eth0'
+    scanner.passive.arp_path = os.path.join(FIXTURES, 'proc_net_arp')
+    return scanner
+
+
+def test_shards_are_merged_as_they_finish(fake_system):
+    scanner = sharded_scanner()
+    shards = []
+
+    devices = scanner.scan_network(on_shard=lambda found: shards.append({d['mac'] for d in found}))
+
+    # 20 fake hosts: .1-.15 answer in the first /28, .16-.20 in the second
+    assert sorted(len(found) for found in shards) == [5, 15]
+    assert set().union(*shards) == {d['mac'] for d in devices}
+    assert len(devices) == 20
+    assert scanner.last_scan['shards'] == 2
+    assert not scanner.last_scan['partial']
+
+
+def test_failed_shard_is_filled_in_from_the_arp_table(fake_system):
+    fake_system.configure(failing_shards=['10.0.0.16/28'])
+    scanner = sharded_scanner()
+
+    devices = scanner.scan_network()
+
+    ips = sorted((d['ip'] for d in devices), key=ipaddress.ip_address)
+    # .17 and .20 are the complete ARP entries in the failed shard; .1 is
+    # in the table too but arp-scan already found it
+    assert ips == [f'10.0.0.{i}' for i in range(1, 16)] + ['10.0.0.17', '10.0.0.20']
+    assert len({d['mac'] for d in devices}) == len(devices)
+    assert scanner.last_scan['partial']
+    assert scanner.last_scan['failed'] == [{
+        'interface': 'eth0',
+        'network': '10.0.0.16/28',
+        'error': 'arp-scan: pcap_activate: No such device',
+    }]
+
+
+def test_every_shard_failing_leaves_only_the_arp_table(fake_system):
+    fake_system.configure(failing_shards=['10.0.0.0/28', '10.0.0.16/28'])
+    scanner = sharded_scanner()
+
+    devices = scanner.scan_network()
+
+    assert sorted(d['ip'] for d in devices) == ['10.0.0.1', '10.0.0.17', '10.0.0.20']
+    assert [shard['network'] for shard in scanner.last_scan['failed']] == ['10.0.0.0/28', '10.0.0.16/28']
@@ -0,0 +1,104 @@
+import pytest
+
+from app.services import firewall
+from app.services.firewall import IpsetBackend, IptablesBackend, mac_rule_spec
+
+CHAIN = 'ARMAS_BLOCK'
+SET = 'armas_block'
+MACS = ['AA:BB:CC:00:00:01', 'AA:BB:CC:00:00:02', 'AA:BB:CC:00:00:03']
+
+
+@pytest.fixture(params=['iptables', 'ipset'])
+def backend(request, fake_system):
+    return firewall.create_backend(request.param, CHAIN, SET)
+
+
+def rule(mac):
+    return ' '.join(mac_rule_spec(mac))
+
+
+def test_setup_jumps_to_the_chain_once(backend, fake_system):
+    backend.setup()
+    backend.setup()
+    assert fake_system.state()['FORWARD'] == [f'-j {CHAIN}']
+    assert backend.list_blocked() == set()
+
+
+def test_nothing_to_list_before_setup(backend):
+    assert backend.list_blocked() is None
+
+
+def test_apply_adds_and_removes_in_one_transaction(backend):
+    backend.setup()
+    assert backend.apply(MACS, [])
+    assert backend.list_blocked() == set(MACS)
+
+    assert backend.apply(['AA:BB:CC:00:00:04'], MACS[:2])
+    assert backend.list_blocked() == {MACS[2], 'AA:BB:CC:00:00:04'}
+
+
+def test_apply_is_one_command_however_many_macs(backend, monkeypatch):
+    backend.setup()
+    commands = []
+    real = firewall.run_command
+
+    def recording(cmd, *args, **kwargs):
+        commands.append(cmd)
+        return real(cmd, *args, **kwargs)
+
+    monkeypatch.setattr(firewall, 'run_command', recording)
+    macs = [f'AA:BB:CC:00:01:{i:02X}' for i in range(200)]
+    assert backend.apply(macs, [])
+    assert len(commands) == 1
+    assert backend.list_blocked() == set(macs)
+
+
+def test_setup_folds_in_legacy_forward_rules(backend, fake_system):
+    fake_system.set_state({'FORWARD': [rule(MACS[0]), '-j ACCEPT', rule(MACS[1])]})
+    backend.setup()
+
+    assert backend.list_blocked() == set(MACS[:2])
+    assert fake_system.state()['FORWARD'] == [f'-j {CHAIN}', '-j ACCEPT']
+
+
+def test_iptables_duplicates_are_removed(fake_system):
+    backend = IptablesBackend(CHAIN)
+    backend.setup()
+    fake_system.set_state(dict(fake_system.state(), **{CHAIN: [rule(MACS[0])] * 3}))
+
+    assert backend.list_blocked() == {MACS[0]}
+    assert fake_system.state()[CHAIN] == [rule(MACS[0])]
+
+
+def test_iptables_failed_batch_changes_nothing(fake_system):
+    backend = IptablesBackend(CHAIN)
+    backend.setup()
+    backend.apply([MACS[0]], [])
+
+    # Removing a rule that isn't there fails the whole restore
+    assert not backend.apply([MACS[1]], [MACS[2]])
+    assert backend.list_blocked() == {MACS[0]}
+
+
+def test_ipset_keeps_a_single_rule(fake_system):
+    backend = IpsetBackend(CHAIN, SET)
+    backend.setup()
+    backend.apply(MACS, [])
+    assert fake_system.state()[CHAIN] == [f'-m set --match-set {SET} src -j DROP']
+    assert sorted(fake_system.state()['ipsets'][SET]) == MACS
+
+
+def test_controller_batch_against_the_fake_cli(backend, fake_system):
+    from app.services.wifi_control import WifiController
+
+    controller = WifiController(backend=backend)
+    macs = [f'AA:BB:CC:00:02:{i:02X}' for i in range(50)]
+    results = controller.apply_batch(macs + ['not-a-mac'], 'block')
+
+    assert all(result['blocked'] and result['changed'] for result in results[:50])
+    assert 'error' in results[50]
+    assert backend.list_blocked() == set(macs)
+
+    controller.apply_batch(macs[:25], 'unblock')
+    assert backend.list_blocked() == set(macs[25:])
+    assert controller.get_blocked_macs() == sorted(macs[25:])
@@ -0,0 +1,86 @@
+import os
+import subprocess
+
+import pytest
+
+from app.services import passive_discovery
+from app.services.passive_discovery import PassiveDiscovery
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+def test_arp_table_keeps_complete_entries_on_the_interface():
+    assert PassiveDiscovery('eth0', fixture('proc_net_arp')).read_arp_table() == {
+        'AA:BB:CC:00:00:01': '10.0.0.1',
+        'AA:BB:CC:00:00:11': '10.0.0.17',
+        'AA:BB:CC:00:00:14': '10.0.0.20',
+    }
+
+
+def test_arp_table_without_an_interface_reads_every_device():
+    entries = PassiveDiscovery(None, fixture('proc_net_arp')).read_arp_table()
+    assert set(entries) == {
+        'AA:BB:CC:00:00:01', 'AA:BB:CC:00:00:11', 'AA:BB:CC:00:00:14', 'DE:AD:BE:EF:00:01'
+    }
+
+
+def test_ip_neigh_is_used_without_proc_net_arp(tmp_path, monkeypatch):
+    with open(fixture('ip_neigh')) as f:
+        output = f.read()
+    calls = []
+
+    def run_command(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout=output, stderr='')
+
+    monkeypatch.setattr(passive_discovery, 'run_command', run_command)
+    entries = PassiveDiscovery('eth0', str(tmp_path / 'missing')).read_arp_table()
+
+    assert calls == [['ip', '-4', 'neigh', 'show', 'dev', 'eth0']]
+    assert entries == {
+        'AA:BB:CC:00:00:01': '10.0.0.1',
+        'AA:BB:CC:00:00:11': '10.0.0.17',
+        'AA:BB:CC:00:00:14': '10.0.0.20',
+    }
+
+
+def test_dnsmasq_leases():
+    leases = PassiveDiscovery(leases_file=fixture('dnsmasq.leases')).read_leases()
+    assert leases == {
+        'AA:BB:CC:00:00:01': ('10.0.0.1', 'laptop'),
+        # An expiry of 0 never runs out; 00:00:03 expired in 2001
+        'AA:BB:CC:00:00:02': ('10.0.0.2', 'printer'),
+        'AA:BB:CC:00:00:04': ('10.0.0.4', None),
+    }
+
+
+def test_isc_leases_later_blocks_win():
+    leases = PassiveDiscovery(leases_file=fixture('dhcpd.leases')).read_leases()
+    assert leases == {
+        'AA:BB:CC:00:00:01': ('10.0.0.1', 'laptop'),
+        # 00:00:03 expired, 00:00:05 was freed and 00:00:06 moved to a new address
+        'AA:BB:CC:00:00:06': ('10.0.0.7', 'tv'),
+        'AA:BB:CC:00:00:08': ('10.0.0.8', None),
+    }
+
+
+@pytest.mark.parametrize('leases_file', [None, 'missing.leases'])
+def test_no_lease_file_means_no_names(leases_file):
+    discovery = PassiveDiscovery('eth0', fixture('proc_net_arp'), leases_file)
+    assert discovery.read_leases() == {}
+    assert {d['name'] for d in discovery.discover()} == {'Unknown'}
+
+
+def test_discover_merges_neighbours_and_leases():
+    devices = PassiveDiscovery('eth0', fixture('proc_net_arp'), fixture('dhcpd.leases')).discover()
+    assert sorted((d['mac'], d['ip'], d['name']) for d in devices) == [
+        ('AA:BB:CC:00:00:01', '10.0.0.1', 'laptop'),
+        ('AA:BB:CC:00:00:06', '10.0.0.7', 'tv'),
+        ('AA:BB:CC:00:00:08', '10.0.0.8', 'Unknown'),
+        ('AA:BB:CC:00:00:11', '10.0.0.17', 'Unknown'),
+        ('AA:BB:CC:00:00:14', '10.0.0.20', 'Unknown'),
+    ]
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+from app.services.schedule_engine import ScheduleEngine
+from fakes import FakeController
+
+MAC = 'AA:BB:CC:DD:EE:01'
+OTHER = 'AA:BB:CC:DD:EE:02'
+# 2026-01-05 is a Monday
+MONDAY = datetime(2026, 1, 5)
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.jobs = {}
+
+    def add_job(self, func, trigger, id, replace_existing=False):
+        self.jobs[id] = trigger.run_date.replace(tzinfo=None)
+
+    def get_job(self, id):
+        return self.jobs.get(id)
+
+    def remove_job(self, id):
+        del self.jobs[id]
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **delta):
+        self.now += timedelta(**delta)
+
+
+def make_engine(tmp_path, clock, controller=None, online=()):
+    return ScheduleEngine(
+        controller or FakeController(), FakeScheduler(), str(tmp_path / 'armas.db'),
+        is_online=lambda mac: mac in online, clock=clock
+    )
+
+
+def test_restart_inside_window_keeps_the_block(tmp_path):
+    clock = Clock(MONDAY.replace(hour=23))
+    controller = FakeController()
+    make_engine(tmp_path, clock, controller).add_schedule([MAC], ['mon'], '22:00', '07:00')
+
+    clock.advance(hours=2)
+    restarted = make_engine(tmp_path, clock, controller)
+    restarted.tick()
+    assert controller.is_blocked(MAC)
+    assert len(controller.calls) == 1
+
+
+def test_window_crossing_midnight(tmp_path):
+    clock = Clock(MONDAY.replace(hour=21, minute=59))
+    controller = FakeController()
+    engine = make_engine(tmp_path, clock, controller)
+    engine.add_schedule([MAC], ['mon'], '22:00', '07:00')
+    assert not controller.is_blocked(MAC)
+    assert engine.scheduler.jobs[ScheduleEngine.JOB_ID] == MONDAY.replace(hour=22)
+
+    clock.now = MONDAY.replace(hour=22)
+    engine.tick()
+    assert controller.is_blocked(MAC)
+    assert engine.scheduler.jobs[ScheduleEngine.JOB_ID] == MONDAY.replace(hour=7) + timedelta(days=1)
+
+    # Still Monday's window after midnight, though Tuesday has none
+    clock.now = MONDAY.replace(hour=3) + timedelta(days=1)
+    engine.tick()
+    assert controller.is_blocked(MAC)
+    assert engine.get_schedules()[0]['active']
+
+    clock.now = MONDAY.replace(hour=7) + timedelta(days=1)
+    engine.tick()
+    assert not controller.is_blocked(MAC)
+
+    clock.now = MONDAY.replace(hour=23) + timedelta(days=1)
+    engine.tick()
+    assert not controller.is_blocked(MAC)
+
+
+def test_quota_blocks_when_used_up_and_resets_at_midnight(tmp_path):
+    clock = Clock(MONDAY.replace(hour=10))
+    controller = FakeController()
+    engine = make_engine(tmp_path, clock, controller, online={MAC})
+    engine.set_quota(MAC, 30)
+
+    clock.advance(minutes=20)
+    engine.tick()
+    assert not controller.is_blocked(MAC)
+    assert engine.get_quotas()[0]['remaining_seconds'] == 600
+
+    clock.advance(minutes=11)
+    engine.tick()
+    assert controller.is_blocked(MAC)
+    assert engine.get_quotas()[0]['exhausted']
+
+    clock.now = MONDAY + timedelta(days=1, seconds=1)
+    engine.tick()
+    assert not controller.is_blocked(MAC)
+    assert engine.get_quotas()[0]['used_seconds'] == 0
+
+
+def test_offline_time_is_not_charged(tmp_path):
+    clock = Clock(MONDAY.replace(hour=10))
+    engine = make_engine(tmp_path, clock, online=())
+    engine.set_quota(MAC, 30)
+    clock.advance(hours=2)
+    engine.tick()
+    assert engine.get_quotas()[0]['used_seconds'] == 0
+
+
+def test_manual_block_is_never_lifted(tmp_path):
+    clock = Clock(MONDAY.replace(hour=21))
+    controller = FakeController()
+    controller.blocked.add(MAC)
+    engine = make_engine(tmp_path, clock, controller)
+    engine.add_schedule([MAC, OTHER], ['mon'], '22:00', '23:00')
+
+    clock.now = MONDAY.replace(hour=22)
+    engine.tick()
+    assert controller.calls == [('block', [OTHER])]
+
+    clock.now = MONDAY.replace(hour=23)
+    engine.tick()
+    assert controller.is_blocked(MAC)
+    assert not controller.is_blocked(OTHER)
+    assert controller.calls[-1] == ('unblock', [OTHER])
+
+
+def test_manual_unblock_holds_until_the_next_window(tmp_path):
+    clock = Clock(MONDAY.replace(hour=22, minute=30))
+    controller = FakeController()
+    engine = make_engine(tmp_path, clock, controller)
+    engine.add_schedule([MAC], ['mon', 'tue'], '22:00', '23:00')
+    assert controller.is_blocked(MAC)
+
+    controller.blocked.discard(MAC)
+    clock.advance(minutes=10)
+    engine.tick()
+    assert not controller.is_blocked(MAC)
+
+    clock.now = MONDAY.replace(hour=23)
+    engine.tick()
+    clock.now = MONDAY.replace(hour=22) + timedelta(days=1)
+    engine.tick()
+    assert controller.is_blocked(MAC)
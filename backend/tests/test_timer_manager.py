@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from app.services.timer_manager import TimerManager
+from app.services.timer_store import TimerStore
+from fakes import FakeController, FakeShaper
+
+MAC = 'AA:BB:CC:DD:EE:01'
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    managers = []
+
+    def make(controller=None, shaper=None):
+        manager = TimerManager(
+            controller or FakeController(), store=TimerStore(str(tmp_path / 'timers.db')),
+            shaper=shaper or FakeShaper()
+        )
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        if manager.scheduler.running:
+            manager.scheduler.shutdown(wait=False)
+
+
+def restart(manager, make, **kwargs):
+    manager.scheduler.shutdown(wait=False)
+    return make(**kwargs)
+
+
+def test_timer_survives_a_restart_with_its_remaining_time(make_manager):
+    manager = make_manager()
+    manager.set_timer(MAC, 10)
+    time.sleep(1.1)
+
+    timer = restart(manager, make_manager).get_timer(MAC)
+    assert timer['action'] == 'block'
+    # The deadline is kept, not restarted from the full ten minutes
+    assert 590 <= timer['remaining_seconds'] < 599
+
+
+def test_throttle_timer_keeps_its_rate(make_manager):
+    manager = make_manager()
+    manager.set_timer(MAC, 5, action='throttle', rate_kbit=256)
+
+    timer = restart(manager, make_manager).get_timer(MAC)
+    assert timer['action'] == 'throttle'
+    assert timer['rate_kbit'] == 256
+
+
+def test_timers_that_expired_while_stopped_are_caught_up(make_manager):
+    controller, shaper = FakeController(), FakeShaper()
+    manager = make_manager(controller, shaper)
+    manager.store.save('timer_AA_BB_CC_DD_EE_01', MAC, 1, time.time() - 30)
+    manager.store.save('timer_AA_BB_CC_DD_EE_02', 'AA:BB:CC:DD:EE:02', 1, time.time() - 30)
+    manager.store.save('timer_AA_BB_CC_DD_EE_03', 'AA:BB:CC:DD:EE:03', 1, time.time() - 30,
+                       action='throttle', rate_kbit=128)
+
+    restarted = restart(manager, make_manager, controller=controller, shaper=shaper)
+
+    # One batched block, not one call per timer
+    assert ('block', [MAC, 'AA:BB:CC:DD:EE:02']) in controller.calls
+    assert shaper.throttled == {'AA:BB:CC:DD:EE:03': 128}
+    assert restarted.store.load() == []
+    assert restarted.get_all_timers() == []
+
+
+def test_cancelled_timer_is_not_restored(make_manager):
+    manager = make_manager()
+    manager.set_timer(MAC, 10)
+    manager.cancel_timer(MAC)
+    assert restart(manager, make_manager).get_timer(MAC) is None
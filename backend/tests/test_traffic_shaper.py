@@ -0,0 +1,151 @@
+import pytest
+
+from app.services.traffic_shaper import FIRST_CLASS, TrafficShaper, mark_rule_spec
+
+CHAIN = 'ARMAS_SHAPE'
+MAC = 'AA:BB:CC:00:00:01'
+OTHER = 'AA:BB:CC:00:00:02'
+
+
+def rule(mac, mark):
+    return ' '.join(mark_rule_spec(mac, mark))
+
+
+@pytest.fixture
+def shaper(fake_system):
+    return TrafficShaper(interfaces=['eth0', 'eth1'], chain=CHAIN)
+
+
+@pytest.fixture
+def started(fake_system):
+    return TrafficShaper(interfaces=['eth0', 'eth1'], chain=CHAIN)
+
+
+def test_plan_creates_the_class_before_marking(shaper):
+    before, rules, after, shaped = shaper.plan({MAC: 512})
+
+    assert before == [
+        'class replace dev eth0 parent 1: classid 1:10 htb rate 512kbit ceil 512kbit',
+        'filter replace dev eth0 parent 1: protocol all prio 1 handle 0x10 fw classid 1:10',
+        'class replace dev eth1 parent 1: classid 1:10 htb rate 512kbit ceil 512kbit',
+        'filter replace dev eth1 parent 1: protocol all prio 1 handle 0x10 fw classid 1:10',
+    ]
+    assert rules == [f'-A {CHAIN} {rule(MAC, FIRST_CLASS)}']
+    assert after == []
+    assert shaped == {MAC: (FIRST_CLASS, 512)}
+    # plan() only works things out
+    assert shaper.get_throttled() == {}
+
+
+def test_plan_rerate_only_replaces_the_class(shaper):
+    shaper._shaped = {MAC: (FIRST_CLASS, 512)}
+
+    before, rules, after, shaped = shaper.plan({MAC: 2000})
+
+    assert before == [
+        'class replace dev eth0 parent 1: classid 1:10 htb rate 2000kbit ceil 2000kbit',
+        'class replace dev eth1 parent 1: classid 1:10 htb rate 2000kbit ceil 2000kbit',
+    ]
+    assert rules == [] and after == []
+    assert shaped == {MAC: (FIRST_CLASS, 2000)}
+
+
+def test_plan_unmarks_before_deleting_the_class(shaper):
+    shaper._shaped = {MAC: (FIRST_CLASS, 512)}
+
+    before, rules, after, shaped = shaper.plan({MAC: None})
+
+    assert before == []
+    assert rules == [f'-D {CHAIN} {rule(MAC, FIRST_CLASS)}']
+    assert after == [
+        'filter del dev eth0 parent 1: protocol all prio 1 handle 0x10 fw',
+        'class del dev eth0 classid 1:10',
+        'filter del dev eth1 parent 1: protocol all prio 1 handle 0x10 fw',
+        'class del dev eth1 classid 1:10',
+    ]
+    assert shaped == {}
+
+
+def test_plan_skips_devices_with_nothing_to_do(shaper):
+    shaper._shaped = {MAC: (FIRST_CLASS, 512)}
+
+    assert shaper.plan({MAC: 512, OTHER: None}) == ([], [], [], {MAC: (FIRST_CLASS, 512)})
+
+
+def test_plan_reuses_freed_marks(shaper):
+    shaper._shaped = {MAC: (FIRST_CLASS, 512)}
+
+    _, rules, _, shaped = shaper.plan({MAC: None, OTHER: 256})
+
+    assert shaped == {OTHER: (FIRST_CLASS, 256)}
+    assert rules == [
+        f'-D {CHAIN} {rule(MAC, FIRST_CLASS)}',
+        f'-A {CHAIN} {rule(OTHER, FIRST_CLASS)}',
+    ]
+
+
+def test_qdiscs_and_chain_are_set_up_once(fake_system):
+    TrafficShaper(interfaces=['eth0', 'eth1'], chain=CHAIN)
+    TrafficShaper(interfaces=['eth0', 'eth1'], chain=CHAIN)
+
+    state = fake_system.state()
+    assert {dev: tree['qdisc'] for dev, tree in state['tc'].items()} == {'eth0': 'htb', 'eth1': 'htb'}
+    assert state['FORWARD'] == [f'-j {CHAIN}', '-j CONNMARK --restore-mark']
+    assert state[CHAIN] == []
+
+
+def test_throttle_rerate_and_unthrottle(started, fake_system):
+    started.throttle(MAC.lower(), 512)
+    started.throttle(OTHER, 2000)
+
+    state = fake_system.state()
+    for dev in ('eth0', 'eth1'):
+        assert state['tc'][dev]['classes'] == {'10': 512, '11': 2000}
+        assert state['tc'][dev]['filters'] == {'10': '10', '11': '11'}
+    assert state[CHAIN] == [rule(MAC, 0x10), rule(OTHER, 0x11)]
+    assert started.get_throttled() == {MAC: 512, OTHER: 2000}
+
+    started.throttle(MAC, 1000)
+    assert fake_system.state()['tc']['eth1']['classes'] == {'10': 1000, '11': 2000}
+    assert started.get_rate(MAC) == 1000
+
+    assert started.unthrottle(MAC)
+    assert not started.unthrottle(MAC)
+
+    state = fake_system.state()
+    for dev in ('eth0', 'eth1'):
+        assert state['tc'][dev]['classes'] == {'11': 2000}
+        assert state['tc'][dev]['filters'] == {'11': '11'}
+    assert state[CHAIN] == [rule(OTHER, 0x11)]
+    assert started.get_throttled() == {OTHER: 2000}
+
+
+def test_restart_reloads_throttles_from_the_system(started):
+    started.throttle(MAC, 512)
+    started.throttle(OTHER, 1000)
+
+    restarted = TrafficShaper(interfaces=['eth0', 'eth1'], chain=CHAIN)
+
+    assert restarted.get_throttled() == {MAC: 512, OTHER: 1000}
+
+
+def test_failed_class_update_leaves_marks_alone(started, fake_system):
+    state = fake_system.state()
+    # An interface that lost its qdisc refuses new classes
+    state['tc']['eth1'] = {'qdisc': 'noqueue', 'classes': {}, 'filters': {}}
+    fake_system.set_state(state)
+
+    with pytest.raises(RuntimeError):
+        started.throttle(MAC, 512)
+
+    assert fake_system.state()[CHAIN] == []
+    assert started.get_throttled() == {}
+
+
+def test_invalid_input_is_rejected(shaper):
+    with pytest.raises(ValueError):
+        shaper.throttle('not-a-mac', 512)
+    with pytest.raises(ValueError):
+        shaper.throttle(MAC, 0)
+    with pytest.raises(ValueError):
+        shaper.throttle(MAC, True)
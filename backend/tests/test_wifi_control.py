@@ -0,0 +1,49 @@
+import pytest
+
+from app.services.wifi_control import WifiController
+
+CHAIN = 'ARMAS_BLOCK'
+MACS = [f'AA:BB:CC:00:02:{i:02X}' for i in range(40)]
+
+
+def rule(mac):
+    return f'-m mac --mac-source {mac} -j DROP'
+
+
+def test_batch_results_follow_the_request(fake_system):
+    controller = WifiController()
+    controller.block_mac(MACS[0])
+
+    results = controller.apply_batch([MACS[0].lower(), 'nope', MACS[1], MACS[1]], 'block')
+
+    assert results == [
+        {'mac': MACS[0], 'blocked': True, 'changed': False},
+        {'mac': 'nope', 'error': 'Invalid MAC address: nope'},
+        {'mac': MACS[1], 'blocked': True, 'changed': True},
+        {'mac': MACS[1], 'blocked': True, 'changed': True},
+    ]
+    assert fake_system.state()[CHAIN] == [rule(MACS[0]), rule(MACS[1])]
+
+    controller.apply_batch(MACS[:2], 'unblock')
+    assert fake_system.state()[CHAIN] == []
+    assert controller.get_blocked_macs() == []
+
+
+def test_batch_retries_after_the_chain_was_edited(fake_system):
+    controller = WifiController()
+    controller.apply_batch(MACS[:3], 'block')
+    state = fake_system.state()
+    state[CHAIN].remove(rule(MACS[0]))
+    fake_system.set_state(state)
+
+    # Deleting the missing rule fails the restore; the retry skips it
+    results = controller.apply_batch(MACS[:3], 'unblock')
+
+    assert [result['blocked'] for result in results] == [False] * 3
+    assert not any('error' in result for result in results)
+    assert fake_system.state()[CHAIN] == []
+
+
+def test_batch_rejects_unknown_actions(fake_system):
+    with pytest.raises(ValueError):
+        WifiController().apply_batch(MACS, 'pause')